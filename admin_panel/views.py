@@ -38,7 +38,7 @@ class ToggleBlockUserView(APIView):
             
             user = get_object_or_404(CustomUser, user_id=user_id)
             user.is_blocked = not user.is_blocked
-            user.save()
+            user.save(update_fields=['is_blocked', 'updated_at'])
             
             return Response({
                 'message': f'User {"unblocked" if not user.is_blocked else "blocked"} successfully',
@@ -6,7 +6,24 @@ from django.conf import settings
 
 
 
-class CustomUserManager(BaseUserManager):
+class CustomUserQuerySet(models.QuerySet):
+    """Counter writes that skip the full-row save and its post_save work."""
+
+    def record_win(self, on_date):
+        return self.update(
+            battles_won=models.F('battles_won') + 1,
+            battle_streak=models.F('battle_streak') + 1,
+            last_win=on_date,
+        )
+
+    def reset_streak(self):
+        return self.update(battle_streak=0)
+
+    def record_battle(self):
+        return self.update(total_battles=models.F('total_battles') + 1)
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     def create_user(self, email, username, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from room.utils.auth import invalidate_ws_auth
+from .models import CustomUser
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def drop_ws_auth_on_blacklist(sender, instance, **kwargs):
+    if instance.token.user_id:
+        invalidate_ws_auth(instance.token.user_id)
+
+
+# Battle counters are not part of the WebSocket principal.
+STAT_FIELDS = frozenset({'battles_won', 'last_win', 'battle_streak', 'total_battles', 'updated_at'})
+
+
+@receiver(post_save, sender=CustomUser)
+def drop_ws_auth_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Covers is_blocked / is_active flips; cached sockets reload the user.
+    if created or (update_fields is not None and update_fields <= STAT_FIELDS):
+        return
+    invalidate_ws_auth(instance.user_id)
@@ -1,10 +1,10 @@
 from room.consumers.base_consumer import BaseConsumer
+from room.services.participant_service import get_bound_participant
+from room.utils.auth import WebSocketAuthMixin
+from room.utils.broadcast import user_group_name
 from room.utils.error_handler import send_error
-from room.models import Room
-from battle.models import BattleResult
-from asgiref.sync import sync_to_async
 from django.utils import timezone
-import json
+from datetime import timedelta
 import asyncio
 
 
@@ -14,84 +14,67 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class BattleConsumer(BaseConsumer):
+class BattleConsumer(BaseConsumer, WebSocketAuthMixin):
+    rate_limits = {
+        'ping': (1, 5),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = None
+        self.participant = None
+        self.deadline = None
+        self.timer_task = None
+
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
+        user = await self.authenticate_user(self.scope['query_string'])
+        if user is None:
+            return
+
+        # Bind the socket to its participant row once; handlers reuse it.
+        participant = await get_bound_participant(self.room_id, user)
+        if participant is None:
+            await self.close(code=4005, reason="Not a participant of this battle")
+            return
+
+        self.user = user
+        self.scope['user'] = user
+        self.participant = participant
         self.group_name = f"battle_{self.room_id}"
+        self.user_group_name = user_group_name(user.user_id)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
         await self.accept()
-        username=self.scope["user"]
-        logger.info(f"[CONNECTED] joined BATTLEEE room {self.room_id}")
-    
-        
+        logger.info(f"[CONNECTED] {user.username} joined battle room {self.room_id}")
 
-        
-        room = await sync_to_async(Room.objects.filter(room_id=self.room_id).first)()
-        if room and room.start_time and room.time_limit > 0:
-            asyncio.create_task(self.send_time_updates())
+        room = participant.room
+        if room.start_time and room.time_limit > 0 and room.status == 'Playing':
+            self.deadline = room.start_time + timedelta(minutes=room.time_limit)
+            self.timer_task = asyncio.create_task(self.send_time_updates())
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        self._stop_timer()
+        if getattr(self, 'user_group_name', None):
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
         await super().disconnect(close_code)
 
-    async def receive(self, text_data):
-        try:
-            data = json.loads(text_data)
-            await self.handle_message(data)
-        except json.JSONDecodeError:
-            await send_error(self, 'Invalid JSON format')
+    async def send_frame(self, event):
+        if event.get('frame_type') == 'battle_completed':
+            self._stop_timer()
+        await super().send_frame(event)
 
     async def handle_message(self, data):
         message_type = data.get('type')
         if message_type=='ping':
-                await self.send(text_data=json.dumps({"type": "pong"}))
-        elif message_type == 'code_verified':
-            await self.handle_code_verified(data)
-        elif message_type == 'battle_completed':
-            await self.battle_completed(data)
+                await self.send_json({"type": "pong"})
         elif message_type == 'battle_started':
             await self.battle_started(data)
         elif message_type == 'start_countdown':
             await self.start_countdown(data)
-        elif message_type == 'time_update':
-            await self.time_update(data)
         else:
             await send_error(self, f'Unknown message type: {message_type}')
 
-    async def handle_code_verified(self, data):
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                'type': 'code_verified',
-                'username': data['username'],
-                'position': data['position'],
-                'message': f"{data['username']} finished {self.get_ordinal(data['position'])}!",
-                'completion_time': data['completion_time']
-            }
-        )
-
-    async def code_verified(self, event):
-        await self.send_json({
-            'type': 'code_verified',
-            'username': event['username'],
-            'position': event['position'],
-            'message': event['message'],
-            'completion_time': event['completion_time']
-        })
-
-    async def battle_completed(self, event):
-        room = await sync_to_async(Room.objects.filter(room_id=self.room_id).first)()
-        max_winners = {2: 1, 5: 2, 10: 3}.get(room.capacity, 1)
-        winners = event.get('winners', [])[:max_winners]
-        await self.send_json({
-            'type': 'battle_completed',
-            'username': event.get('user', ''),
-            'question_id': event.get('question_id', ''),
-            'winners': winners,
-            'room_capacity': room.capacity,
-            'message': event.get('message', 'Battle Ended!')
-        })
-
     async def battle_started(self, event):
         await self.send_json({
             'type': 'battle_started',
@@ -109,42 +92,20 @@ class BattleConsumer(BaseConsumer):
             'question_id': event.get('question_id', '')
         })
 
-    async def time_update(self, event):
-        await self.send_json({
-            'type': 'time_update',
-            'remaining_seconds': event['remaining_seconds']
-        })
-
     async def send_time_updates(self):
-        room = await sync_to_async(Room.objects.filter(room_id=self.room_id).first)()
-        while room and room.status == 'Playing' and room.time_limit > 0:
-            elapsed_seconds = (timezone.now() - room.start_time).total_seconds()
-            remaining_seconds = max(0, room.time_limit * 60 - elapsed_seconds)
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    'type': 'time_update',
-                    'remaining_seconds': round(remaining_seconds, 2)
-                }
-            )
+        """Sync this player's clock with the cached deadline; no DB or group traffic."""
+        while True:
+            remaining_seconds = max(0, (self.deadline - timezone.now()).total_seconds())
+            await self.send_json({
+                'type': 'time_update',
+                'remaining_seconds': round(remaining_seconds, 2)
+            })
             if remaining_seconds <= 0:
-                room.status = 'completed'
-                await sync_to_async(room.save)()
-                battle_result = await sync_to_async(BattleResult.objects.filter(room=room).first)()
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        'type': 'battle_completed',
-                        'message': 'Battle ended due to time limit!',
-                        'winners': battle_result.results[:{2: 1, 5: 2, 10: 3}.get(room.capacity, 1)] if battle_result else [],
-                        'room_capacity': room.capacity
-                    }
-                )
+                # The deadline worker finalizes the battle and broadcasts the result.
                 break
-            await asyncio.sleep(10)
-            room = await sync_to_async(Room.objects.filter(room_id=self.room_id).first)()
+            await asyncio.sleep(min(10, remaining_seconds))
 
-    def get_ordinal(self, n):
-        s = ["th", "st", "nd", "rd"]
-        v = n % 100
-        return f"{n}{s[(v - 20) % 10] if (v - 20) % 10 < 4 else s[0]}"  
\ No newline at end of file
+    def _stop_timer(self):
+        if self.timer_task:
+            self.timer_task.cancel()
+            self.timer_task = None
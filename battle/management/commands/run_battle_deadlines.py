@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from battle.services.deadline_service import drain_due_battles, next_deadline
+from room.services.countdown_service import fire_due_starts, next_start
+
+
+class Command(BaseCommand):
+    help = "Finalize timed battles as soon as their deadline passes, and start battles whose countdown ran out."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-sleep', type=float, default=0.25,
+            help="Upper bound in seconds between two looks at the deadline and countdown sets."
+        )
+
+    def handle(self, *args, **options):
+        max_sleep = options['max_sleep']
+        self.stdout.write(self.style.SUCCESS("[DEADLINES] Worker started"))
+        while True:
+            finalized = drain_due_battles()
+            if finalized:
+                self.stdout.write(f"[DEADLINES] Finalized {finalized} battle(s)")
+
+            started = fire_due_starts()
+            if started:
+                self.stdout.write(f"[DEADLINES] Started {started} battle(s)")
+
+            upcoming = min(
+                (when for when in (next_deadline(), next_start()) if when is not None),
+                default=None,
+            )
+            if upcoming is None:
+                delay = max_sleep
+            else:
+                delay = min(max(upcoming - time.time(), 0), max_sleep)
+            time.sleep(delay)
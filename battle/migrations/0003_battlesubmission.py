@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-19 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('room', '0004_room_participant_count_within_capacity'),
+        ('battle', '0002_alter_userranking_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BattleSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('completed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('battle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='battle.battleresult')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='room.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='battle_submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='battlesubmission',
+            constraint=models.UniqueConstraint(fields=('room', 'user'), name='unique_submission_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='battlesubmission',
+            constraint=models.UniqueConstraint(fields=('room', 'position'), name='unique_submission_position'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-19 14:40
+
+from django.conf import settings
+from django.db import migrations
+from django.utils.dateparse import parse_datetime
+
+
+def copy_results_to_submissions(apps, schema_editor):
+    BattleResult = apps.get_model('battle', 'BattleResult')
+    BattleSubmission = apps.get_model('battle', 'BattleSubmission')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    submissions = []
+    for battle in BattleResult.objects.exclude(results=[]).iterator():
+        entries = sorted(battle.results, key=lambda r: r.get('position') or 0)
+        users = dict(User.objects.filter(
+            username__in=[r['username'] for r in entries]
+        ).values_list('username', 'pk'))
+        seen = set()
+        for entry in entries:
+            user_id = users.get(entry['username'])
+            if user_id is None or user_id in seen:
+                continue
+            seen.add(user_id)
+            completed_at = entry.get('completion_time')
+            submissions.append(BattleSubmission(
+                battle_id=battle.pk,
+                room_id=battle.room_id,
+                user_id=user_id,
+                # Renumber so duplicate positions from the old race stay unique
+                position=len(seen),
+                completed_at=(completed_at and parse_datetime(completed_at)) or battle.updated_at,
+            ))
+    BattleSubmission.objects.bulk_create(submissions, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('battle', '0003_battlesubmission'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_results_to_submissions, migrations.RunPython.noop),
+    ]
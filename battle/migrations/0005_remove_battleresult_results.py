@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 14:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0004_copy_battle_results'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='battleresult',
+            name='results',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0005_remove_battleresult_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battleresult',
+            name='settled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
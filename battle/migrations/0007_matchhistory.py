@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-19 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('problems', '0002_auto_20250720_1558'),
+        ('battle', '0006_battleresult_settled_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_id', models.UUIDField(editable=False, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('topic', models.CharField(max_length=50)),
+                ('difficulty', models.CharField(max_length=10)),
+                ('capacity', models.PositiveSmallIntegerField()),
+                ('is_ranked', models.BooleanField()),
+                ('started_at', models.DateTimeField(null=True)),
+                ('ended_at', models.DateTimeField()),
+                ('question', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='match_history', to='problems.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-ended_at', '-id'], name='battle_matc_ended_a_8d923e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MatchHistoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(null=True)),
+                ('completed_at', models.DateTimeField(null=True)),
+                ('ended_at', models.DateTimeField()),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='battle.matchhistory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_history', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-ended_at', '-id'], name='battle_matc_user_id_074ed8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='matchhistoryentry',
+            constraint=models.UniqueConstraint(fields=('match', 'user'), name='unique_history_entry_per_user'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 18:20
+
+from django.db import migrations
+
+
+def merge_duplicate_results(apps, schema_editor):
+    BattleResult = apps.get_model('battle', 'BattleResult')
+    BattleSubmission = apps.get_model('battle', 'BattleSubmission')
+
+    keep = {}
+    for pk, room_id, question_id in BattleResult.objects.order_by('created_at', 'pk').values_list(
+        'pk', 'room_id', 'question_id'
+    ):
+        first = keep.setdefault((room_id, question_id), pk)
+        if first != pk:
+            BattleSubmission.objects.filter(battle_id=pk).update(battle_id=first)
+            BattleResult.objects.filter(pk=pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0007_matchhistory'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_results, migrations.RunPython.noop),
+    ]
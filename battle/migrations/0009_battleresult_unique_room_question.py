@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0008_merge_duplicate_battle_results'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='battleresult',
+            constraint=models.UniqueConstraint(fields=('room', 'question'), name='unique_battle_result_per_question'),
+        ),
+    ]
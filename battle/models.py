@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 import uuid
-from django.db.models import JSONField
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -9,31 +9,84 @@ class BattleResult(models.Model):
     battle_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     room = models.ForeignKey('room.Room', on_delete=models.CASCADE, related_name='results')
     question = models.ForeignKey('problems.Question', on_delete=models.CASCADE, related_name='battle_results')
-    results = models.JSONField(default=list)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set once ratings and player stats have been applied for this battle
+    settled_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['battle_id']),
             models.Index(fields=['created_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'question'], name='unique_battle_result_per_question'),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
         return f"BattleResult for Room {self.room.name} - Question {self.question.title}"
 
-    def add_participant_result(self, user, position, completion_time):
-        """Add or update a participant's result in the JSONField."""
-        existing_results = self.results
-        participant_result = {
-            'username': user.username,
-            'position': position,
-            'completion_time': completion_time.isoformat() if completion_time else None,
-        }
-        existing_results.append(participant_result)
-        self.results = existing_results
-        self.save()
+class BattleSubmission(models.Model):
+    """One correct submission per user and battle, with its finishing position."""
+    battle = models.ForeignKey(BattleResult, on_delete=models.CASCADE, related_name='submissions')
+    room = models.ForeignKey('room.Room', on_delete=models.CASCADE, related_name='submissions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='battle_submissions')
+    position = models.PositiveIntegerField()
+    completed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'], name='unique_submission_per_user'),
+            models.UniqueConstraint(fields=['room', 'position'], name='unique_submission_position'),
+        ]
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.user.username} #{self.position} in Room {self.room_id}"
+
+class MatchHistory(models.Model):
+    """
+    Append-only record of a finished battle, written when its room is cleaned
+    up. Copies only what history and replays need, so nothing points back at
+    the room and the hot room tables can be emptied freely.
+    """
+    match_id = models.UUIDField(unique=True, editable=False)
+    question = models.ForeignKey('problems.Question', null=True, on_delete=models.SET_NULL, related_name='match_history')
+    name = models.CharField(max_length=100)
+    topic = models.CharField(max_length=50)
+    difficulty = models.CharField(max_length=10)
+    capacity = models.PositiveSmallIntegerField()
+    is_ranked = models.BooleanField()
+    started_at = models.DateTimeField(null=True)
+    ended_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-ended_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"Match {self.match_id} ({self.name})"
+
+class MatchHistoryEntry(models.Model):
+    """One player's line in a MatchHistory; ended_at is copied for per-user keyset reads."""
+    match = models.ForeignKey(MatchHistory, on_delete=models.CASCADE, related_name='entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='match_history')
+    position = models.PositiveSmallIntegerField(null=True)
+    completed_at = models.DateTimeField(null=True)
+    ended_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'user'], name='unique_history_entry_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-ended_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in Match {self.match_id}"
 
 class UserRanking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='battle_rankings')
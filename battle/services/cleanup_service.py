@@ -0,0 +1,74 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from battle.models import BattleResult, BattleSubmission
+from battle.services.deadline_service import cancel_battle_deadlines
+from battle.services.history_service import archive_rooms
+from room.models import ChatMessage, Room, RoomParticipant
+from room.services.chat_service import delete_chat_streams
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_BATCH = 500
+# Every status a room can be left in; legacy rows use the capitalized forms
+CLEANABLE_STATUSES = ('active', 'Playing', 'playing', 'completed', 'Completed', 'closed')
+IDLE_ROOM_AGE = timedelta(hours=1)
+STALE_BATTLE_AGE = timedelta(minutes=65)
+
+
+def expired_rooms(now=None):
+    """Rooms never started within an hour, or started more than 65 minutes ago."""
+    now = now or timezone.now()
+    return Room.objects.filter(status__in=CLEANABLE_STATUSES).filter(
+        Q(start_time__isnull=True, created_at__lte=now - IDLE_ROOM_AGE)
+        | Q(start_time__isnull=False, start_time__lte=now - STALE_BATTLE_AGE)
+    )
+
+
+def delete_rooms(room_ids):
+    """
+    Archive the finished battles among the rooms to match history, then remove
+    the rooms and everything hanging off them with one
+    DELETE ... WHERE room_id IN (...) per table. Returns rows per table.
+    """
+    room_ids = list(room_ids)
+    if not room_ids:
+        return {}
+    str_ids = [str(room_id) for room_id in room_ids]
+    with transaction.atomic():
+        # Locked so overlapping cleanups archive and delete each room once
+        list(Room.objects.select_for_update().filter(room_id__in=room_ids).values_list('room_id'))
+        counts = {
+            'archived': archive_rooms(room_ids),
+            'participants': RoomParticipant.objects.filter(room_id__in=room_ids).delete()[0],
+            'chat_messages': ChatMessage.objects.filter(room_id__in=str_ids).delete()[0],
+            'submissions': BattleSubmission.objects.filter(room_id__in=room_ids).delete()[0],
+            'results': BattleResult.objects.filter(room_id__in=room_ids).delete()[0],
+        }
+        # Dependents are already gone, so the cascade collector finds nothing left
+        counts['rooms'] = Room.objects.filter(room_id__in=room_ids).delete()[1].get('room.Room', 0)
+    delete_chat_streams(str_ids)
+    cancel_battle_deadlines(str_ids)
+    return counts
+
+
+def cleanup_expired_rooms(now=None, batch_size=CLEANUP_BATCH):
+    """Delete expired rooms chunk by chunk; returns totals and timing for the run."""
+    started = time.monotonic()
+    totals = {'batches': 0, 'archived': 0, 'rooms': 0, 'participants': 0, 'chat_messages': 0, 'submissions': 0, 'results': 0}
+    expired = expired_rooms(now)
+    while True:
+        room_ids = list(expired.order_by().values_list('room_id', flat=True)[:batch_size])
+        if not room_ids:
+            break
+        for table, count in delete_rooms(room_ids).items():
+            totals[table] += count
+        totals['batches'] += 1
+    totals['seconds'] = round(time.monotonic() - started, 3)
+    logger.info(f"[CLEANUP] {totals}")
+    return totals
@@ -0,0 +1,85 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from battle.models import BattleSubmission
+from battle.services.deadline_service import cancel_battle_deadline
+from battle.tasks import cleanup_room_data, settle_battle
+from room.models import Room, RoomParticipant
+from room.utils.broadcast import broadcast_sync
+
+logger = logging.getLogger(__name__)
+
+WINNER_SLOTS = {2: 1, 5: 2, 10: 3}
+CLEANUP_DELAY = 5 * 60
+
+
+def final_standings(room):
+    """
+    Order every participant of a finished battle: finishers by position, then
+    everyone who did not solve the question in time.
+    """
+    submissions = BattleSubmission.objects.filter(room=room).order_by('position').values_list(
+        'user_id', 'user__username', 'position', 'completed_at'
+    )
+    standings = [
+        {'username': username, 'position': position, 'completion_time': completed_at.isoformat(), 'finished': True}
+        for _, username, position, completed_at in submissions
+    ]
+    unfinished = RoomParticipant.objects.filter(room=room).in_battle().exclude(
+        user_id__in=[s[0] for s in submissions]
+    ).values_list('user__username', flat=True)
+    standings.extend(
+        {'username': username, 'position': None, 'completion_time': None, 'finished': False}
+        for username in unfinished
+    )
+    return standings
+
+
+def build_completion_event(room, message, user=None, question_id=None):
+    """Everything recipients render on completion, so their handlers do no I/O."""
+    max_winners = WINNER_SLOTS.get(room.capacity, 1)
+    standings = final_standings(room)
+    return {
+        'type': 'battle_completed',
+        'room_id': str(room.room_id),
+        'message': message,
+        'winners': [s for s in standings if s['finished']][:max_winners],
+        'standings': standings,
+        'room_capacity': room.capacity,
+        'winner_slots': max_winners,
+        'question_id': str(question_id if question_id is not None else room.active_question_id or ''),
+        'ended_at': timezone.now().isoformat(),
+        # The player whose submission ended the battle; '' when time ran out
+        'username': user.username if user is not None else '',
+    }
+
+
+def complete_battle(room_id, message='Battle Ended!', user=None, question_id=None):
+    """
+    Move a running battle to 'completed' exactly once.
+
+    The status flip is a conditional UPDATE, so whichever caller gets there
+    first (a winning submission or the deadline worker) broadcasts
+    `battle_completed` and schedules cleanup; every later caller is a no-op.
+    The event is built inside the transaction but only sent once the flip has
+    committed, so players never hear about a completion that rolled back.
+    """
+    with transaction.atomic():
+        updated = Room.objects.filter(room_id=room_id, status='Playing').update(
+            status='completed', updated_at=timezone.now()
+        )
+        if not updated:
+            return False
+
+        room = Room.objects.get(room_id=room_id)
+        event = build_completion_event(room, message, user=user, question_id=question_id)
+
+        winner_slots = WINNER_SLOTS.get(room.capacity, 1)
+        transaction.on_commit(lambda: broadcast_sync(f"battle_{room_id}", event))
+        transaction.on_commit(lambda: settle_battle.delay(str(room_id), winner_slots))
+        transaction.on_commit(lambda: cleanup_room_data.apply_async((str(room_id),), countdown=CLEANUP_DELAY))
+    cancel_battle_deadline(room_id)
+    logger.info(f"[BATTLE_COMPLETED] Room {room_id}: {message}")
+    return True
@@ -0,0 +1,84 @@
+"""
+Deadline scheduler for timed battles.
+
+Every running battle with a time limit is kept in a single Redis sorted set,
+scored by the epoch second at which it must end. Scheduling, cancelling and
+claiming a battle are all O(log n), and the worker only ever looks at the head
+of the set, so expiry never requires scanning rooms in the database.
+"""
+
+import logging
+import time
+
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+DEADLINES_KEY = 'battle:deadlines'
+# Seconds before a battle whose finalization failed is claimed again
+RETRY_DELAY = 5
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def schedule_battle_deadline(room_id, ends_at):
+    """Register (or move) the end time of a battle."""
+    _redis().zadd(DEADLINES_KEY, {str(room_id): ends_at.timestamp()})
+
+
+def cancel_battle_deadline(room_id):
+    """Drop a battle from the scheduler, e.g. when it finished early."""
+    _redis().zrem(DEADLINES_KEY, str(room_id))
+
+
+def cancel_battle_deadlines(room_ids):
+    if room_ids:
+        _redis().zrem(DEADLINES_KEY, *[str(room_id) for room_id in room_ids])
+
+
+def next_deadline():
+    """Return the epoch time of the earliest pending deadline, or None."""
+    head = _redis().zrange(DEADLINES_KEY, 0, 0, withscores=True)
+    return head[0][1] if head else None
+
+
+def claim_due_battles(now=None, limit=100):
+    """
+    Pop the battles whose deadline has passed.
+
+    A battle is only returned to the caller whose ZREM actually removed it, so
+    several workers can drain the same set without finalizing a battle twice.
+    Callers that fail to finalize a claimed battle must hand it back with
+    retry_battle_deadline.
+    """
+    now = time.time() if now is None else now
+    conn = _redis()
+    due = conn.zrangebyscore(DEADLINES_KEY, '-inf', now, start=0, num=limit)
+    claimed = []
+    for member in due:
+        if conn.zrem(DEADLINES_KEY, member):
+            claimed.append(member.decode() if isinstance(member, bytes) else member)
+    return claimed
+
+
+def retry_battle_deadline(room_id, now=None):
+    """Put a claimed battle back at the head of the set, unless it was rescheduled meanwhile."""
+    now = time.time() if now is None else now
+    _redis().zadd(DEADLINES_KEY, {str(room_id): now + RETRY_DELAY}, nx=True)
+
+
+def drain_due_battles(now=None):
+    """Finalize every battle whose deadline has passed. Returns the count."""
+    from battle.services.completion_service import complete_battle
+
+    finalized = 0
+    for room_id in claim_due_battles(now):
+        try:
+            if complete_battle(room_id, message='Battle ended due to time limit!'):
+                finalized += 1
+        except Exception as e:
+            logger.error(f"[DEADLINE] Failed to finalize battle {room_id}, retrying: {str(e)}")
+            retry_battle_deadline(room_id)
+    return finalized
@@ -0,0 +1,163 @@
+"""
+Match history.
+
+Finished battles are copied into MatchHistory / MatchHistoryEntry just before
+cleanup deletes their room, so history survives while room_room and its
+dependents only ever hold live and recently finished rooms. Both tables are
+append-only and read newest first in keyset pages over (ended_at, id): a
+player's history is one range scan of the (user, ended_at, id) index.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import F, Q
+
+from battle.models import BattleResult, BattleSubmission, MatchHistory, MatchHistoryEntry
+from room.models import Room, RoomParticipant
+
+ARCHIVABLE_STATUSES = ('completed', 'Completed')
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def archive_rooms(room_ids):
+    """
+    Copy the finished battles among `room_ids` into match history in two bulk
+    INSERTs. Call inside the transaction that deletes the rooms, after locking
+    them, so a room is archived exactly once. Returns matches archived.
+    """
+    rooms = list(
+        Room.objects.filter(room_id__in=list(room_ids), status__in=ARCHIVABLE_STATUSES, start_time__isnull=False)
+        .exclude(room_id__in=MatchHistory.objects.values('match_id'))
+        .values('room_id', 'active_question_id', 'name', 'topic', 'difficulty', 'capacity',
+                'is_ranked', 'start_time', 'updated_at')
+    )
+    if not rooms:
+        return 0
+    ids = [room['room_id'] for room in rooms]
+    questions = dict(BattleResult.objects.filter(room_id__in=ids).values_list('room_id', 'question_id'))
+
+    # complete_battle stamps updated_at when it flips the status to 'completed'
+    matches = MatchHistory.objects.bulk_create([
+        MatchHistory(
+            match_id=room['room_id'],
+            question_id=questions.get(room['room_id'], room['active_question_id']),
+            name=room['name'],
+            topic=room['topic'],
+            difficulty=room['difficulty'],
+            capacity=room['capacity'],
+            is_ranked=room['is_ranked'],
+            started_at=room['start_time'],
+            ended_at=room['updated_at'],
+        )
+        for room in rooms
+    ])
+    by_room = {match.match_id: match for match in matches}
+
+    entries = {}
+    for room_id, user_id, position, completed_at in BattleSubmission.objects.filter(room_id__in=ids).values_list(
+        'room_id', 'user_id', 'position', 'completed_at'
+    ):
+        entries[room_id, user_id] = (position, completed_at)
+    present = RoomParticipant.objects.filter(room_id__in=ids).in_battle()
+    for room_id, user_id in present.values_list('room_id', 'user_id'):
+        entries.setdefault((room_id, user_id), (None, None))
+    MatchHistoryEntry.objects.bulk_create([
+        MatchHistoryEntry(
+            match=by_room[room_id],
+            user_id=user_id,
+            position=position,
+            completed_at=completed_at,
+            ended_at=by_room[room_id].ended_at,
+        )
+        for (room_id, user_id), (position, completed_at) in entries.items()
+    ])
+    return len(matches)
+
+
+def _encode_cursor(ended_at, row_id):
+    micros = (ended_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}|{row_id}'
+
+
+def _decode_cursor(cursor):
+    micros, _, row_id = cursor.partition('|')
+    return EPOCH + timedelta(microseconds=int(micros)), int(row_id)
+
+
+def _after(rows, cursor):
+    if not cursor:
+        return rows
+    ended_at, row_id = _decode_cursor(cursor)
+    return rows.filter(Q(ended_at__lt=ended_at) | Q(ended_at=ended_at, id__lt=row_id))
+
+
+def user_history(user_id, cursor=None, limit=PAGE_SIZE):
+    """
+    One page of a player's matches, newest first: {'matches', 'next_cursor'}.
+    Raises ValueError for a malformed cursor or limit.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    rows = _after(MatchHistoryEntry.objects.filter(user_id=user_id), cursor)
+    rows = list(
+        rows.order_by('-ended_at', '-id').values(
+            'id', 'ended_at', 'position', 'completed_at', 'match__match_id', 'match__name', 'match__topic',
+            'match__difficulty', 'match__capacity', 'match__is_ranked', 'match__question_id',
+        )[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'matches': [
+            {
+                'match_id': str(row['match__match_id']),
+                'name': row['match__name'],
+                'topic': row['match__topic'],
+                'difficulty': row['match__difficulty'],
+                'capacity': row['match__capacity'],
+                'is_ranked': row['match__is_ranked'],
+                'question_id': row['match__question_id'],
+                'position': row['position'],
+                'finished': row['position'] is not None,
+                'completed_at': row['completed_at'] and row['completed_at'].isoformat(),
+                'ended_at': row['ended_at'].isoformat(),
+            }
+            for row in rows
+        ],
+        'next_cursor': _encode_cursor(rows[-1]['ended_at'], rows[-1]['id']) if has_more else None,
+    }
+
+
+def match_detail(match_id):
+    """A single archived match with its full standings, or None."""
+    try:
+        match = MatchHistory.objects.filter(match_id=uuid.UUID(str(match_id))).first()
+    except ValueError:
+        return None
+    if match is None:
+        return None
+    entries = match.entries.order_by(F('position').asc(nulls_last=True), 'user__username').values_list(
+        'user__username', 'position', 'completed_at'
+    )
+    return {
+        'match_id': str(match.match_id),
+        'name': match.name,
+        'topic': match.topic,
+        'difficulty': match.difficulty,
+        'capacity': match.capacity,
+        'is_ranked': match.is_ranked,
+        'question_id': match.question_id,
+        'started_at': match.started_at and match.started_at.isoformat(),
+        'ended_at': match.ended_at.isoformat(),
+        'standings': [
+            {
+                'username': username,
+                'position': position,
+                'completion_time': completed_at and completed_at.isoformat(),
+                'finished': position is not None,
+            }
+            for username, position, completed_at in entries
+        ],
+    }
@@ -0,0 +1,57 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from battle.models import BattleResult
+from rankings.services.leaderboard_service import active_season_id, sync_rankings
+from rankings.services.standings_service import refresh_players
+from rankings.utils import battle_placements, battle_winners, calculate_elo
+from room.models import Room
+
+logger = logging.getLogger(__name__)
+
+
+def _publish_ratings(user_ids):
+    try:
+        season_id = active_season_id()
+        sync_rankings(season_id, user_ids)
+        refresh_players(season_id, user_ids)
+    except Exception as e:
+        # The board can be restored with `manage.py rebuild_leaderboard`
+        logger.error(f"[ERROR] Leaderboard update failed: {str(e)}")
+
+
+def settle_battle(room_id, winner_slots=1):
+    """
+    Apply ratings and player stats for a completed battle exactly once.
+
+    The BattleResult row is the idempotency key: settled_at is claimed with a
+    conditional UPDATE in the same transaction as the writes it guards, so a
+    retried or duplicated task either sees it set and returns False, or rolls
+    the claim back together with a failed settlement.
+    """
+    room = Room.objects.filter(room_id=room_id).first()
+    if room is None or room.active_question_id is None:
+        return False
+
+    with transaction.atomic():
+        battle, _ = BattleResult.objects.get_or_create(room=room, question_id=room.active_question_id)
+        claimed = BattleResult.objects.filter(pk=battle.pk, settled_at__isnull=True).update(
+            settled_at=timezone.now()
+        )
+        if not claimed:
+            return False
+
+        placements = battle_placements(room)
+        if room.is_ranked:
+            calculate_elo(room, winner_slots, placements)
+            transaction.on_commit(lambda: _publish_ratings(list(placements)))
+
+        winners = battle_winners(room, placements, winner_slots)
+        CustomUser.objects.filter(pk__in=winners).record_win(timezone.now().date())
+        CustomUser.objects.filter(pk__in=placements).exclude(pk__in=winners).reset_streak()
+
+    logger.info(f"[BATTLE_SETTLED] Room {room_id}: {len(placements)} players")
+    return True
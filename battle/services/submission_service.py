@@ -0,0 +1,34 @@
+from django.db import IntegrityError, transaction
+
+from battle.models import BattleResult, BattleSubmission
+from room.models import Room
+
+
+def record_submission(room, question, user):
+    """
+    Record a correct submission and assign its finishing position.
+
+    The room row is locked with SELECT ... FOR UPDATE, so concurrent correct
+    submissions for the same battle take positions one at a time; the unique
+    (room, position) and (room, user) constraints back this up. The status is
+    read under the same lock, so nothing is recorded once complete_battle has
+    ended the battle. Returns (submission, created), or (None, False) when the
+    battle is not running.
+    """
+    try:
+        with transaction.atomic():
+            room_status = Room.objects.select_for_update().filter(
+                room_id=room.room_id
+            ).values_list('status', flat=True).first()
+            if room_status != 'Playing':
+                return None, False
+            existing = BattleSubmission.objects.filter(room=room, user=user).first()
+            if existing:
+                return existing, False
+            battle, _ = BattleResult.objects.get_or_create(room=room, question=question)
+            position = BattleSubmission.objects.filter(room=room).count() + 1
+            return BattleSubmission.objects.create(
+                battle=battle, room=room, user=user, position=position
+            ), True
+    except IntegrityError:
+        return BattleSubmission.objects.get(room=room, user=user), False
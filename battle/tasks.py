@@ -1,73 +1,56 @@
+"""
+Celery tasks that remove a room and everything related to it once it has
+ended (status 'completed') or been closed (status 'closed'): participants,
+chat rows and stream, battle results and submissions, and the room itself.
+Deletes are set-based (see battle.services.cleanup_service), so cleaning one
+room or a chunk of hundreds costs the same handful of statements.
+"""
+
 from celery import shared_task
-from .models import BattleResult
-from room.models import Room, RoomParticipant, ChatMessage
-from django.db import transaction
-from datetime import timedelta
-from django.utils import timezone
-from itertools import chain
+from room.models import Room
+from .services.cleanup_service import cleanup_expired_rooms, delete_rooms
 import logging
 
 logger = logging.getLogger(__name__)
-"""
-Celery task to handle the cleanup of all database records related to a room 
-after it has either ended (status: 'completed') or been forcefully closed 
-(status: 'closed').
-
-This includes:
-- Deleting all RoomParticipant entries linked to the room
-- Deleting all ChatMessage entries (based on string room_id)
-- Deleting related BattleResult entries (only if the room was completed)
-- Deleting the Room itself
-
-The task is designed to run asynchronously with a delay ( 5 minutes),
-ensuring no immediate abrupt data removal for user-side transitions.
-"""
 
 
 @shared_task
 def cleanup_room_data(room_id):
-    try:
-        with transaction.atomic():
-            room = Room.objects.get(room_id=room_id)
-
-            
-            
-            RoomParticipant.objects.filter(room=room).delete()
-
-            ChatMessage.objects.filter(room_id=str(room_id)).delete()
-
-            if room.status == "Completed":
-                BattleResult.objects.filter(room=room).delete()
-
-            room.delete()  
-
-            return f"[CLEANED] Room {room_id} and related data cleaned successfully."
-
-    except Room.DoesNotExist:
+    if not Room.objects.filter(room_id=room_id).exists():
         return f"[ERROR] Room with ID {room_id} does not exist."
-    
+    delete_rooms([room_id])
+    return f"[CLEANED] Room {room_id} and related data cleaned successfully."
+
 
 @shared_task
 def cleanup_inactive_rooms():
-    now = timezone.now()
-
-    inactive_rooms = Room.objects.filter(
-        status__in=['active', 'Playing','completed'],
-        start_time__isnull=True,
-        created_at__lte=now - timedelta(hours=1)
-    )
+    """Sweep expired rooms in chunks in this task, without fanning out per room."""
+    totals = cleanup_expired_rooms()
+    return f'[CLEANUP-TASK] {totals}'
 
 
-    stale_rooms = Room.objects.filter(
-        status__in=['active', 'Playing','Completed'],
-        start_time__isnull=False,
-        start_time__lte=now - timedelta(minutes=65)
-    )
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def settle_battle(self, room_id, winner_slots=1):
+    """Ratings and player stats for a completed battle; safe to run more than once."""
+    from battle.services.settlement_service import settle_battle as settle
 
-    rooms_to_cleanup = inactive_rooms.union(stale_rooms)
-    cleaned_count = rooms_to_cleanup.count()
+    try:
+        settled = settle(room_id, winner_slots)
+    except Exception as e:
+        logger.error(f"[ERROR] Settlement failed for room {room_id}: {str(e)}")
+        raise self.retry(exc=e)
+    return f'[SETTLE-TASK] Room {room_id} {"settled" if settled else "already settled"}.'
 
-    for room in rooms_to_cleanup:
-        cleanup_room_data.delay(str(room.room_id))  
 
-    return f'[CLEANUP-TASK] {cleaned_count} inactive/long-running rooms scheduled for cleanup.'
+@shared_task
+def drain_battle_deadlines():
+    """
+    Safety net for the deadline worker: finalize any battle that is overdue
+    and start any battle whose countdown has run out.
+    """
+    from battle.services.deadline_service import drain_due_battles
+    from room.services.countdown_service import fire_due_starts
+
+    finalized = drain_due_battles()
+    started = fire_due_starts()
+    return f'[DEADLINE-TASK] {finalized} expired battles finalized, {started} battles started.'
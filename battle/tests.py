@@ -0,0 +1,351 @@
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from battle.models import BattleResult, BattleSubmission, MatchHistory, MatchHistoryEntry
+from battle.services import deadline_service
+from battle.services.cleanup_service import CLEANABLE_STATUSES, cleanup_expired_rooms, delete_rooms
+from battle.services.completion_service import complete_battle
+from battle.services.history_service import user_history
+from battle.services.settlement_service import settle_battle
+from battle.services.submission_service import record_submission
+from problems.models import Question
+from rankings.models import Ranking, Season
+from room.models import ChatMessage, Room, RoomParticipant
+
+
+def make_users(count, prefix='player'):
+    suffix = uuid.uuid4().hex[:6]
+    return [
+        CustomUser.objects.create_user(email=f'{prefix}{i}-{suffix}@example.com', username=f'{prefix}{i}-{suffix}')
+        for i in range(count)
+    ]
+
+
+def make_question():
+    slug = f'two-sum-{uuid.uuid4().hex[:8]}'
+    return Question.objects.create(
+        title=slug, slug=slug, description='Add two numbers.', difficulty='EASY', tags='ARRAY', is_validate=True,
+    )
+
+
+def make_room(owner, participants=(), question=None, **fields):
+    """A room and its participant rows, created without the room-list broadcast signal."""
+    fields.setdefault('capacity', max(2, len(participants) + 1))
+    room = Room.objects.bulk_create([Room(
+        name='Test room', owner=owner, topic='ARRAY', difficulty='EASY', time_limit=10,
+        participant_count=len(participants) + 1, active_question=question, **fields,
+    )])[0]
+    RoomParticipant.objects.bulk_create(
+        [RoomParticipant(room=room, user=owner, role='host', status='joined')]
+        + [RoomParticipant(room=room, user=user, status='joined') for user in participants]
+    )
+    return room
+
+
+def submit(room, question, user, position, completed_at=None):
+    battle, _ = BattleResult.objects.get_or_create(room=room, question=question)
+    return BattleSubmission.objects.create(
+        battle=battle, room=room, user=user, position=position, completed_at=completed_at or timezone.now(),
+    )
+
+
+class DeadlineClaimTests(SimpleTestCase):
+
+    def setUp(self):
+        self.key = f'test:battle:deadlines:{uuid.uuid4().hex}'
+        patcher = mock.patch.object(deadline_service, 'DEADLINES_KEY', self.key)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = deadline_service._redis()
+        self.addCleanup(self.conn.delete, self.key)
+
+    def test_due_battles_are_claimed_exactly_once(self):
+        self.conn.zadd(self.key, {'due-a': 100, 'due-b': 200, 'later': 10_000})
+
+        first = deadline_service.claim_due_battles(now=500)
+        second = deadline_service.claim_due_battles(now=500)
+
+        self.assertEqual(sorted(first), ['due-a', 'due-b'])
+        self.assertEqual(second, [])
+        self.assertEqual(self.conn.zrange(self.key, 0, -1), [b'later'])
+
+    @mock.patch('battle.services.completion_service.complete_battle', side_effect=RuntimeError('db down'))
+    def test_failed_finalization_is_handed_back(self, complete_battle):
+        self.conn.zadd(self.key, {'room-1': 100})
+
+        finalized = deadline_service.drain_due_battles(now=500)
+
+        self.assertEqual(finalized, 0)
+        score = self.conn.zscore(self.key, 'room-1')
+        self.assertIsNotNone(score)
+        self.assertGreater(score, 500)
+
+    @mock.patch('battle.services.completion_service.complete_battle', return_value=True)
+    def test_finalized_battle_leaves_the_set(self, complete_battle):
+        self.conn.zadd(self.key, {'room-1': 100})
+
+        self.assertEqual(deadline_service.drain_due_battles(now=500), 1)
+        complete_battle.assert_called_once_with('room-1', message='Battle ended due to time limit!')
+        self.assertIsNone(self.conn.zscore(self.key, 'room-1'))
+
+
+class SubmissionTests(TestCase):
+
+    def setUp(self):
+        self.owner, self.player = make_users(2)
+        self.question = make_question()
+        self.room = make_room(self.owner, [self.player], self.question, status='Playing', start_time=timezone.now())
+
+    def test_positions_follow_submission_order(self):
+        first, created = record_submission(self.room, self.question, self.player)
+        second, _ = record_submission(self.room, self.question, self.owner)
+
+        self.assertTrue(created)
+        self.assertEqual((first.position, second.position), (1, 2))
+        self.assertEqual(BattleResult.objects.filter(room=self.room).count(), 1)
+
+    def test_repeated_submission_keeps_its_position(self):
+        first, _ = record_submission(self.room, self.question, self.player)
+        again, created = record_submission(self.room, self.question, self.player)
+
+        self.assertFalse(created)
+        self.assertEqual(again.pk, first.pk)
+
+    def test_submission_after_completion_is_refused(self):
+        Room.objects.filter(room_id=self.room.room_id).update(status='completed')
+
+        submission, created = record_submission(self.room, self.question, self.player)
+
+        self.assertIsNone(submission)
+        self.assertFalse(created)
+        self.assertFalse(BattleSubmission.objects.filter(room=self.room).exists())
+
+
+class SubmissionRaceTests(TransactionTestCase):
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_submissions_get_distinct_positions(self):
+        owner, *players = make_users(6, prefix='racer')
+        question = make_question()
+        room = make_room(owner, players, question, status='Playing', start_time=timezone.now())
+        barrier = threading.Barrier(len(players))
+        errors = []
+
+        def run(user):
+            try:
+                barrier.wait()
+                record_submission(room, question, user)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(user,)) for user in players]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        positions = sorted(BattleSubmission.objects.filter(room=room).values_list('position', flat=True))
+        self.assertEqual(positions, list(range(1, len(players) + 1)))
+
+
+@mock.patch('battle.services.completion_service.cancel_battle_deadline')
+@mock.patch('battle.services.completion_service.cleanup_room_data')
+@mock.patch('battle.services.completion_service.settle_battle')
+@mock.patch('battle.services.completion_service.broadcast_sync')
+class CompletionTests(TestCase):
+
+    def setUp(self):
+        self.owner, self.player = make_users(2)
+        self.room = make_room(self.owner, [self.player], make_question(), status='Playing', start_time=timezone.now())
+
+    def test_completion_is_broadcast_after_commit(self, broadcast, settle, cleanup, cancel_deadline):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(complete_battle(self.room.room_id))
+            broadcast.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        broadcast.assert_called_once()
+        self.assertEqual(broadcast.call_args.args[1]['type'], 'battle_completed')
+        settle.delay.assert_called_once()
+
+    def test_only_the_first_caller_completes(self, broadcast, settle, cleanup, cancel_deadline):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = complete_battle(self.room.room_id)
+            second = complete_battle(self.room.room_id)
+
+        self.assertEqual((first, second), (True, False))
+        broadcast.assert_called_once()
+
+
+class SettlementTests(TestCase):
+
+    def setUp(self):
+        self.season = Season.objects.create(name=f'Season {uuid.uuid4().hex[:6]}', is_active=True)
+        self.winner, self.loser = make_users(2)
+        self.question = make_question()
+        self.room = make_room(
+            self.winner, [self.loser], self.question, status='completed', start_time=timezone.now(), is_ranked=True,
+        )
+        submit(self.room, self.question, self.winner, 1)
+
+    def test_settling_twice_applies_ratings_and_stats_once(self):
+        self.assertTrue(settle_battle(self.room.room_id))
+        ratings = dict(Ranking.objects.filter(season=self.season).values_list('user_id', 'rating'))
+
+        self.assertFalse(settle_battle(self.room.room_id))
+
+        self.assertEqual(dict(Ranking.objects.filter(season=self.season).values_list('user_id', 'rating')), ratings)
+        self.assertGreater(ratings[self.winner.pk], 1200)
+        self.assertLess(ratings[self.loser.pk], 1200)
+        winner = Ranking.objects.get(season=self.season, user=self.winner)
+        self.assertEqual((winner.total_matches, winner.wins, winner.losses), (1, 1, 0))
+        self.winner.refresh_from_db()
+        self.loser.refresh_from_db()
+        self.assertEqual((self.winner.battles_won, self.winner.battle_streak), (1, 1))
+        self.assertEqual((self.loser.battles_won, self.loser.battle_streak), (0, 0))
+        self.assertIsNotNone(BattleResult.objects.get(room=self.room).settled_at)
+
+    def test_team_battle_with_one_finisher_has_one_winner(self):
+        owner, *players = make_users(10, prefix='team')
+        room = make_room(
+            owner, players, self.question, status='completed', start_time=timezone.now(), is_ranked=True,
+        )
+        finisher = players[0]
+        submit(room, self.question, finisher, 1)
+
+        self.assertTrue(settle_battle(room.room_id, winner_slots=3))
+
+        rankings = {r.user_id: r for r in Ranking.objects.filter(season=self.season, user__in=[owner, *players])}
+        self.assertEqual(len(rankings), 10)
+        self.assertEqual((rankings[finisher.pk].wins, rankings[finisher.pk].losses), (1, 0))
+        self.assertGreater(rankings[finisher.pk].rating, 1200)
+        for user_id, ranking in rankings.items():
+            if user_id != finisher.pk:
+                self.assertEqual((ranking.wins, ranking.losses), (0, 1))
+                self.assertLess(ranking.rating, 1200)
+        self.assertEqual(
+            set(CustomUser.objects.filter(battles_won=1).values_list('pk', flat=True)), {finisher.pk}
+        )
+
+
+@mock.patch('battle.services.cleanup_service.cancel_battle_deadlines')
+@mock.patch('battle.services.cleanup_service.delete_chat_streams')
+class CleanupServiceTests(TestCase):
+
+    def setUp(self):
+        self.owner, self.player = make_users(2)
+        self.question = make_question()
+
+    def test_delete_rooms_removes_dependents_in_every_status(self, delete_streams, cancel_deadlines):
+        rooms = []
+        for status in ('active', 'Playing', 'playing', 'completed', 'Completed', 'closed'):
+            room = make_room(self.owner, [self.player], self.question, status=status)
+            ChatMessage.objects.create(room_id=str(room.room_id), sender='player', message='gl hf')
+            submit(room, self.question, self.player, 1)
+            rooms.append(room)
+        room_ids = [room.room_id for room in rooms]
+
+        counts = delete_rooms(room_ids)
+
+        self.assertEqual(counts['rooms'], 6)
+        self.assertEqual(counts['participants'], 12)
+        self.assertEqual(counts['chat_messages'], 6)
+        self.assertEqual(counts['submissions'], 6)
+        self.assertEqual(counts['results'], 6)
+        self.assertFalse(Room.objects.filter(room_id__in=room_ids).exists())
+        self.assertFalse(RoomParticipant.objects.filter(room_id__in=room_ids).exists())
+        self.assertFalse(ChatMessage.objects.filter(room_id__in=[str(r) for r in room_ids]).exists())
+        delete_streams.assert_called_once_with([str(r) for r in room_ids])
+        cancel_deadlines.assert_called_once_with([str(r) for r in room_ids])
+
+    def test_cleanup_expired_rooms_covers_every_status_in_batches(self, delete_streams, cancel_deadlines):
+        long_ago = timezone.now() - timedelta(hours=2)
+        idle = [make_room(self.owner, status=status) for status in CLEANABLE_STATUSES]
+        Room.objects.filter(room_id__in=[r.room_id for r in idle]).update(created_at=long_ago)
+        stale = make_room(self.owner, status='Playing', start_time=long_ago)
+        fresh = make_room(self.owner, status='active')
+        running = make_room(self.owner, status='Playing', start_time=timezone.now())
+
+        totals = cleanup_expired_rooms(batch_size=2)
+
+        self.assertEqual(totals['rooms'], len(idle) + 1)
+        self.assertEqual(totals['batches'], (len(idle) + 2) // 2)
+        self.assertFalse(Room.objects.filter(room_id=stale.room_id).exists())
+        self.assertEqual(
+            set(Room.objects.values_list('room_id', flat=True)), {fresh.room_id, running.room_id}
+        )
+
+    def test_finished_battles_are_archived_before_delete(self, delete_streams, cancel_deadlines):
+        winner, unfinished, lobby_leaver, kicked = make_users(4, prefix='archived')
+        started = timezone.now() - timedelta(minutes=30)
+        room = make_room(
+            self.owner, [winner, unfinished, lobby_leaver, kicked], self.question,
+            status='completed', start_time=started,
+        )
+        RoomParticipant.objects.filter(room=room, user=lobby_leaver).update(
+            status='left', left_at=started - timedelta(minutes=1)
+        )
+        RoomParticipant.objects.filter(room=room, user=kicked).update(status='kicked', left_at=started)
+        submit(room, self.question, winner, 1)
+
+        counts = delete_rooms([room.room_id])
+
+        self.assertEqual(counts['archived'], 1)
+        self.assertFalse(Room.objects.filter(room_id=room.room_id).exists())
+        match = MatchHistory.objects.get(match_id=room.room_id)
+        self.assertEqual(match.question_id, self.question.id)
+        self.assertEqual(match.started_at, started)
+        entries = dict(match.entries.values_list('user_id', 'position'))
+        self.assertEqual(entries, {winner.pk: 1, unfinished.pk: None, self.owner.pk: None})
+
+    def test_rooms_without_a_finished_battle_are_not_archived(self, delete_streams, cancel_deadlines):
+        lobby = make_room(self.owner, [self.player], self.question, status='active')
+        abandoned = make_room(self.owner, [self.player], self.question, status='Playing', start_time=timezone.now())
+
+        counts = delete_rooms([lobby.room_id, abandoned.room_id])
+
+        self.assertEqual(counts['archived'], 0)
+        self.assertFalse(MatchHistory.objects.exists())
+
+
+class MatchHistoryPagingTests(TestCase):
+
+    def setUp(self):
+        (self.user,) = make_users(1)
+        ended = timezone.now()
+        # Two matches share an end time so the cursor has to break the tie on id
+        for minutes in (0, 0, 5, 10, 15):
+            match = MatchHistory.objects.create(
+                match_id=uuid.uuid4(), name='Ranked 1v1', topic='ARRAY', difficulty='EASY',
+                capacity=2, is_ranked=True, ended_at=ended - timedelta(minutes=minutes),
+            )
+            MatchHistoryEntry.objects.create(match=match, user=self.user, position=1, ended_at=match.ended_at)
+
+    def test_pages_cover_every_match_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            page = user_history(self.user.pk, cursor=cursor, limit=2)
+            seen.extend(page['matches'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len({match['match_id'] for match in seen}), 5)
+        ended = [match['ended_at'] for match in seen]
+        self.assertEqual(ended, sorted(ended, reverse=True))
+
+    def test_malformed_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            user_history(self.user.pk, cursor='not-a-cursor')
@@ -1,10 +1,17 @@
 from django.urls import path
-from .views import BattleQuestionAPIView, QuestionVerifyAPIView,GlobalRankingAPIView
+from .views import (
+    BattleQuestionAPIView, QuestionVerifyAPIView,GlobalRankingAPIView, MyRankingAPIView, SeasonStandingsAPIView,
+    MatchHistoryAPIView, MatchDetailAPIView,
+)
 
 urlpatterns = [
     path('<int:question_id>/', BattleQuestionAPIView.as_view(), name='get-problem-details'),
     path('<int:question_id>/verify/', QuestionVerifyAPIView.as_view(), name='get-problem-verify'),
      path('global-rankings/', GlobalRankingAPIView.as_view(), name='global-rankings'),
+     path('global-rankings/me/', MyRankingAPIView.as_view(), name='my-ranking'),
+     path('global-rankings/seasons/<int:season_id>/', SeasonStandingsAPIView.as_view(), name='season-standings'),
+     path('history/', MatchHistoryAPIView.as_view(), name='match-history'),
+     path('history/<uuid:match_id>/', MatchDetailAPIView.as_view(), name='match-detail'),
    
 
 
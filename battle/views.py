@@ -7,19 +7,21 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-
 from problems.models import Question, TestCase, SolvedCode, Example
 from problems.serializers import QuestionListSerializer, TestCaseSerializer, ExampleSerializer
 from problems.services.judge0_service import verify_with_judge0
 from problems.utils import extract_function_name_and_params
 
-from battle.models import BattleResult, UserRanking
-from rankings.utils import calculate_elo_1v1, calculate_elo_squad, calculate_elo_team
+from rankings.services.leaderboard_service import (
+    DEFAULT_LIMIT, MAX_LIMIT, active_season_id, around, rank_of, size, top
+)
+from rankings.services.standings_service import standing_for, standings_page
 from room.models import Room
+from room.utils.broadcast import broadcast_sync, push_to_user
 
-from .tasks import cleanup_room_data
+from .services.completion_service import WINNER_SLOTS, complete_battle
+from .services.history_service import PAGE_SIZE as HISTORY_PAGE_SIZE, match_detail, user_history
+from .services.submission_service import record_submission
 
 logger = logging.getLogger(__name__)
 
@@ -95,24 +97,11 @@ class QuestionVerifyAPIView(APIView):
             if room.status == 'completed':
                 return Response({'error': 'Battle has already ended'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Time limit check
+            # Time limit check; the deadline worker normally finalizes first
             if room.time_limit > 0:
                 elapsed_minutes = (timezone.now() - room.start_time).total_seconds() / 60
                 if elapsed_minutes > room.time_limit:
-                    room.status = 'completed'
-                    room.save()
-                    cleanup_room_data.apply_async((room.room_id,), countdown=5 * 60)
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f"battle_{room_id}",
-                        {
-                            'type': 'battle_completed',
-                            'message': 'Battle ended due to time limit',
-                            'winners': BattleResult.objects.filter(room=room).first().results
-                                if BattleResult.objects.filter(room=room).exists() else [],
-                            'room_capacity': room.capacity
-                        }
-                    )
+                    complete_battle(room.room_id, message='Battle ended due to time limit')
                     return Response({'error': 'Time limit exceeded'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Fetch testcases
@@ -126,70 +115,34 @@ class QuestionVerifyAPIView(APIView):
                 return Response(verification_result, status=status.HTTP_400_BAD_REQUEST)
 
             if verification_result.get('all_passed'):
-                battle_result, _ = BattleResult.objects.get_or_create(
-                    room=room,
-                    question=question,
-                    defaults={'results': []}
-                )
-
-                existing_results = battle_result.results
-                if any(result['username'] == request.user.username for result in existing_results):
+                submission, created = record_submission(room, question, request.user)
+                if submission is None:
+                    return Response({'error': 'Battle has already ended'}, status=status.HTTP_400_BAD_REQUEST)
+                if not created:
                     return Response({'message': 'You have already submitted a correct solution', 'all_passed': True}, status=status.HTTP_200_OK)
 
-                position = len(existing_results) + 1
-                battle_result.add_participant_result(
-                    user=request.user,
-                    position=position,
-                    completion_time=timezone.now()
-                )
+                position = submission.position
                 verification_result['position'] = position
 
-                # ----- New Ranking / Elo system -----
-                if room.is_ranked:
-                    participants = list(room.participants.all())
-                    if room.capacity == 2:
-                        calculate_elo_1v1(room.room_id, winner_id=request.user.user_id)
-                    elif 3 <= room.capacity <= 5:
-                        calculate_elo_squad(room)
-                    elif room.capacity >= 6:
-                        calculate_elo_team(room)
-
-                # Update user stats
-                if position == 1:
-                    request.user.battles_won += 1
-                    request.user.last_win = timezone.now().date()
-                    request.user.save()
-
-
-                max_winners = {2: 1, 5: 2, 10: 3}.get(room.capacity, 1)
-                if len(existing_results) + 1 >= max_winners:
-                    room.status = 'completed'
-                    room.save()
-                    cleanup_room_data.apply_async((room.room_id,), countdown=5 * 60)
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f"battle_{room_id}",
-                        {
-                            'type': 'battle_completed',
-                            'user': request.user.username,
-                            'question_id': str(question_id),
-                            'winners': battle_result.results[:max_winners],
-                            'room_capacity': room.capacity,
-                            'message': 'Battle Ended!'
-                        }
-                    )
+                # Ratings and win stats are settled once the battle completes
+                max_winners = WINNER_SLOTS.get(room.capacity, 1)
+                if position >= max_winners:
+                    complete_battle(room.room_id, user=request.user, question_id=question_id)
                 else:
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f"battle_{room_id}",
-                        {
-                            'type': 'code_verified',
-                            'username': request.user.username,
-                            'position': position,
-                            'completion_time': timezone.now().isoformat()
-                        }
-                    )
-
+                    broadcast_sync(f"battle_{room_id}", {
+                        'type': 'code_verified',
+                        'username': request.user.username,
+                        'position': position,
+                        'completion_time': submission.completed_at.isoformat()
+                    })
+
+            # Private verdict for the submitter's battle socket(s) only
+            push_to_user(request.user.user_id, {
+                'type': 'verdict',
+                'question_id': str(question_id),
+                'all_passed': verification_result.get('all_passed', False),
+                'position': verification_result.get('position'),
+            })
             return Response(verification_result, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -197,19 +150,99 @@ class QuestionVerifyAPIView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     
+def _ranking_row(entry):
+    return {
+        'rank': entry['rank'],
+        'username': entry['username'],
+        'points': round(entry['rating']),
+    }
+
+
 class GlobalRankingAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):  
-        rankings = UserRanking.objects.select_related('user').order_by('-points')[:100]
-        ranking_data = []
-        
+    def get(self, request):
+        season_id = active_season_id()
+        if season_id is None:
+            return Response([])
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response([_ranking_row(entry) for entry in top(season_id, limit, offset)])
+
+
+class MyRankingAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        season_id = active_season_id()
+        entry = season_id and rank_of(season_id, request.user.user_id)
+        if not entry:
+            return Response({'rank': None, 'points': None, 'around': []})
 
-        for index, rank in enumerate(rankings, start=1):
-            ranking_data.append({
-                'rank': index,
-                'username': rank.user.username,
-                'points': rank.points
-            })
+        standing = standing_for(season_id, request.user.user_id)
+        return Response({
+            **_ranking_row(entry),
+            'percentile': standing.percentile if standing else None,
+            'tier': standing.tier if standing else None,
+            'total_players': size(season_id),
+            'around': [_ranking_row(e) for e in around(season_id, request.user.user_id)],
+        })
+
+
+class SeasonStandingsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, season_id):
+        try:
+            after_rank = int(request.query_params.get('after_rank', 0))
+            limit = max(1, min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+        except ValueError:
+            return Response({'error': 'after_rank and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        standings = standings_page(season_id, after_rank, limit)
+        return Response({
+            'season_id': season_id,
+            'standings': [
+                {
+                    'rank': row['rank'],
+                    'username': row['user__username'],
+                    'rating': round(row['rating'], 2),
+                    'percentile': row['percentile'],
+                    'tier': row['tier'],
+                    'wins': row['wins'],
+                    'losses': row['losses'],
+                    'is_final': row['is_final'],
+                }
+                for row in standings
+            ],
+            'next_after_rank': standings[-1]['rank'] if len(standings) == limit else None,
+        })
+
+
+class MatchHistoryAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            page = user_history(
+                request.user.user_id,
+                cursor=request.query_params.get('cursor'),
+                limit=request.query_params.get('limit', HISTORY_PAGE_SIZE),
+            )
+        except ValueError:
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page)
+
+
+class MatchDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        return Response(ranking_data)   
\ No newline at end of file
+    def get(self, request, match_id):
+        match = match_detail(match_id)
+        if match is None:
+            return Response({'error': 'Match not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(match)
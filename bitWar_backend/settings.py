@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import config, Csv
 import logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -166,11 +166,39 @@ ASGI_APPLICATION = 'bitWar_backend.asgi.application'
 
 
 
+# REDIS ROLES
+# Each role can point at its own Redis. Channel layers accept a comma separated
+# list of URLs; channels_redis shards channels and groups across them, so the
+# layer can be spread over several Redis nodes behind multiple Daphne hosts.
+REDIS_CHANNELS_URLS = config('REDIS_CHANNELS_URLS', default='redis://127.0.0.1:6379/0', cast=Csv())
+# The global `rooms` group fans out to every lobby browser; give it its own layer
+REDIS_ROOMS_CHANNELS_URLS = config('REDIS_ROOMS_CHANNELS_URLS', default=','.join(REDIS_CHANNELS_URLS), cast=Csv())
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='redis://127.0.0.1:6379/1')
+# Battle deadlines, chat streams and other live state
+REDIS_REALTIME_URL = config('REDIS_REALTIME_URL', default=REDIS_CACHE_URL)
+
+# channels_redis.pubsub.RedisPubSubChannelLayer scales group fan-out better across nodes
+CHANNEL_LAYER_BACKEND = config('CHANNEL_LAYER_BACKEND', default='channels_redis.core.RedisChannelLayer')
+CHANNEL_LAYER_CAPACITY = config('CHANNEL_LAYER_CAPACITY', default=100, cast=int)
+ROOMS_CHANNEL_LAYER = 'rooms'
+
+# Seconds a WebSocket presence entry survives without a heartbeat
+PRESENCE_TTL = config('PRESENCE_TTL', default=45, cast=int)
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": CHANNEL_LAYER_BACKEND,
         "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)],
+            "hosts": REDIS_CHANNELS_URLS,
+            "capacity": CHANNEL_LAYER_CAPACITY,
+        },
+    },
+    ROOMS_CHANNEL_LAYER: {
+        "BACKEND": CHANNEL_LAYER_BACKEND,
+        "CONFIG": {
+            "hosts": REDIS_ROOMS_CHANNELS_URLS,
+            "capacity": CHANNEL_LAYER_CAPACITY,
+            "prefix": "asgi-rooms",
         },
     },
 }
@@ -228,11 +256,16 @@ IMAGEKIT_URL_ENDPOINT = config('IMAGEKIT_URL_ENDPOINT')
 
 
 # CELERY CONFIGURATIONS FOR DATABASE CLEAN UP
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/1'
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/1')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# LOBBY CHAT: capped Redis stream per room, copied to Postgres in batches.
+# Turn persistence off only where chat may be lost once a stream is trimmed.
+CHAT_STREAM_MAXLEN = config('CHAT_STREAM_MAXLEN', default=500, cast=int)
+CHAT_PERSIST_TO_DB = config('CHAT_PERSIST_TO_DB', default=True, cast=bool)
+
 # THE LANGUAGES AND ITS IDS FOR JUDGE0 CODE EXICUTION
 LANGUAGE_MAP = {
     "python": 71,
@@ -255,11 +288,18 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379/1",
+        "LOCATION": REDIS_CACHE_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         }
-    }
+    },
+    "realtime": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_REALTIME_URL,
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        }
+    },
 }
 
 # Templates
@@ -286,10 +326,25 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'battle.tasks.cleanup_inactive_rooms',  
         'schedule': crontab(minute='*/10'),  # Every 10 minutes
     },
-    'create-new-season-every-30-days': {
-        'task': 'ranking.tasks.check_and_create_new_season',
-        'schedule': crontab(hour=0, minute=0, day_of_month='1'),  
-        
+    'flush-chat-history-every-minute': {
+        'task': 'room.tasks.flush_chat_history',
+        'schedule': crontab(),
+    },
+    'drain-battle-deadlines-every-minute': {
+        'task': 'battle.tasks.drain_battle_deadlines',
+        'schedule': crontab(),  # Fallback for the run_battle_deadlines worker
+    },
+    'refresh-season-standings-every-15-mins': {
+        'task': 'rankings.tasks.refresh_season_standings',
+        'schedule': crontab(minute='*/15'),
+    },
+    'seed-leaderboard-every-minute': {
+        'task': 'rankings.tasks.rebuild_leaderboard',
+        'schedule': crontab(),  # No-op unless the active season's board is missing
+    },
+    'check-season-rollover-hourly': {
+        'task': 'rankings.tasks.check_and_create_new_season',
+        'schedule': crontab(minute=0),  # Also resumes an interrupted rollover
     },
 }
 
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rankings.services.leaderboard_service import active_season_id, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis leaderboard of a season from its Ranking rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, help="Season id; defaults to the active season.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        season_id = options['season'] or active_season_id()
+        if season_id is None:
+            raise CommandError("No active season found.")
+        total = rebuild(season_id, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"[LEADERBOARD] Season {season_id}: {total} players loaded"))
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-19 15:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rankings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('rating', models.FloatField()),
+                ('total_matches', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='rankings.season')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_standings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['season', 'rank'],
+                'indexes': [models.Index(fields=['season', 'rank'], name='rankings_se_season__ca56d2_idx')],
+                'unique_together': {('season', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SeasonRollover',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('archive', 'Archive standings'), ('carry', 'Carry ratings over'), ('leaderboard', 'Rebuild leaderboard'), ('done', 'Done')], default='archive', max_length=20)),
+                ('cursor_rating', models.FloatField(blank=True, null=True)),
+                ('cursor_id', models.BigIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('from_season', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollover', to='rankings.season')),
+                ('to_season', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rolled_from', to='rankings.season')),
+            ],
+        ),
+    ]
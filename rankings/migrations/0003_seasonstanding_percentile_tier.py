@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+def mark_archived_final(apps, schema_editor):
+    # Everything archived before this migration was written at season end
+    SeasonStanding = apps.get_model('rankings', 'SeasonStanding')
+    SeasonStanding.objects.update(is_final=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0002_seasonstanding_seasonrollover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seasonstanding',
+            name='percentile',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='seasonstanding',
+            name='tier',
+            field=models.CharField(choices=[('grandmaster', 'Grandmaster'), ('master', 'Master'), ('diamond', 'Diamond'), ('platinum', 'Platinum'), ('gold', 'Gold'), ('silver', 'Silver'), ('bronze', 'Bronze')], default='bronze', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='seasonstanding',
+            name='is_final',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='seasonstanding',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='seasonrollover',
+            name='total',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_archived_final, migrations.RunPython.noop),
+    ]
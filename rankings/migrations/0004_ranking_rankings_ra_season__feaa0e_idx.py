@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0003_seasonstanding_percentile_tier'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ranking',
+            index=models.Index(fields=['season', '-rating', 'id'], name='rankings_ra_season__feaa0e_idx'),
+        ),
+    ]
@@ -34,6 +34,74 @@ class Ranking(models.Model):
     class Meta:
         unique_together = ('user', 'season')
         ordering = ['-rating']
+        indexes = [
+            # Season leaderboard order; the rollover archive pages through it by keyset
+            models.Index(fields=['season', '-rating', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.rating}"
+
+
+class SeasonStanding(models.Model):
+    """
+    Materialized standing of a player in a season. Refreshed after settlements
+    while the season runs and frozen (is_final) by the rollover archive.
+    """
+    TIER_CHOICES = (
+        ('grandmaster', 'Grandmaster'),
+        ('master', 'Master'),
+        ('diamond', 'Diamond'),
+        ('platinum', 'Platinum'),
+        ('gold', 'Gold'),
+        ('silver', 'Silver'),
+        ('bronze', 'Bronze'),
+    )
+
+    season = models.ForeignKey(Season, on_delete=models.CASCADE, related_name='standings')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='season_standings')
+    rank = models.PositiveIntegerField()
+    rating = models.FloatField()
+    total_matches = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    # Share of the season's players ranked at or below this one, 0-100
+    percentile = models.FloatField(default=0)
+    tier = models.CharField(max_length=20, choices=TIER_CHOICES, default='bronze')
+    is_final = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('season', 'user')
+        indexes = [
+            models.Index(fields=['season', 'rank']),
+        ]
+        ordering = ['season', 'rank']
+
+    def __str__(self):
+        return f"{self.user} #{self.rank} in {self.season}"
+
+
+class SeasonRollover(models.Model):
+    """Progress of one season rollover, so an interrupted run resumes where it stopped."""
+    STAGE_CHOICES = (
+        ('archive', 'Archive standings'),
+        ('carry', 'Carry ratings over'),
+        ('leaderboard', 'Rebuild leaderboard'),
+        ('done', 'Done'),
+    )
+
+    from_season = models.OneToOneField(Season, on_delete=models.CASCADE, related_name='rollover')
+    to_season = models.OneToOneField(Season, on_delete=models.CASCADE, related_name='rolled_from')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='archive')
+    # Keyset cursor of the current stage: (rating, id) while archiving, id while carrying
+    cursor_rating = models.FloatField(null=True, blank=True)
+    cursor_id = models.BigIntegerField(default=0)
+    # Players in the closing season, counted once when archiving starts
+    total = models.PositiveIntegerField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.from_season} -> {self.to_season} ({self.stage})"
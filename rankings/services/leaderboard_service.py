@@ -0,0 +1,249 @@
+"""
+Season leaderboards kept in Redis.
+
+Every season has a sorted set of user_id -> rating and a hash of
+user_id -> username, so top-N pages, a player's rank and the window around
+them are ZREVRANGE / ZREVRANK calls (O(log n)) instead of ORDER BY over the
+Ranking table. Settlement pushes the players it touched; `rebuild` restores a
+season from the Ranking rows and marks the board built. A board without that
+mark (a fresh deploy, a flushed Redis) is rebuilt by a beat task, and the
+first reader that finds it unbuilt queues one rebuild straight away.
+
+Settlement also records the players it pushed in a short-lived `touched` set.
+A rebuild copies Ranking rows into staging keys while settlements keep writing
+to the live board, so before swapping staging in it re-reads everyone touched
+since it started; the swap is a WATCHed transaction on that set, so a push
+that lands during the swap sends the rebuild round again instead of being
+overwritten.
+"""
+
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+from rankings.models import Ranking, Season
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+REBUILD_BATCH = 5000
+REBUILD_LOCK_TTL = 600
+# A reader that finds the board unbuilt queues at most one rebuild per window
+REBUILD_REQUEST_TTL = 60
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def leaderboard_key(season_id):
+    return f'leaderboard:{season_id}'
+
+
+def names_key(season_id):
+    return f'leaderboard:{season_id}:names'
+
+
+def built_key(season_id):
+    return f'leaderboard:{season_id}:built'
+
+
+def rebuild_lock_key(season_id):
+    return f'leaderboard:{season_id}:rebuilding'
+
+
+def rebuild_requested_key(season_id):
+    return f'leaderboard:{season_id}:rebuild-requested'
+
+
+def touched_key(season_id):
+    return f'leaderboard:{season_id}:touched'
+
+
+def active_season_id():
+    return Season.objects.filter(is_active=True).values_list('id', flat=True).first()
+
+
+def _add_entries(pipe, season_id, entries, key=None, names=None):
+    """entries: iterable of (user_id, username, rating)."""
+    scores, usernames = {}, {}
+    for user_id, username, rating in entries:
+        scores[user_id] = rating
+        usernames[user_id] = username
+    if scores:
+        pipe.zadd(key or leaderboard_key(season_id), scores)
+        pipe.hset(names or names_key(season_id), mapping=usernames)
+
+
+def _ranking_rows(season_id, user_ids):
+    return Ranking.objects.filter(season_id=season_id, user_id__in=user_ids).values_list(
+        'user_id', 'user__username', 'rating'
+    )
+
+
+def sync_rankings(season_id, user_ids):
+    """Push the current ratings of `user_ids` into the season leaderboard."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    pipe = _redis().pipeline()
+    _add_entries(pipe, season_id, _ranking_rows(season_id, user_ids))
+    # Lets a rebuild that is running re-read these players before its swap
+    pipe.sadd(touched_key(season_id), *user_ids)
+    pipe.expire(touched_key(season_id), REBUILD_LOCK_TTL)
+    pipe.execute()
+
+
+def _entries(season_id, rows, first_rank):
+    """Attach usernames and 1-based ranks to (member, score) pairs."""
+    if not rows:
+        return []
+    usernames = _redis().hmget(names_key(season_id), [member for member, _ in rows])
+    return [
+        {
+            'rank': first_rank + offset,
+            'user_id': int(member),
+            'username': username.decode() if username else None,
+            'rating': round(score, 2),
+        }
+        for offset, ((member, score), username) in enumerate(zip(rows, usernames))
+    ]
+
+
+def top(season_id, limit=DEFAULT_LIMIT, offset=0):
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    offset = max(0, int(offset))
+    pipe = _redis().pipeline()
+    pipe.zrevrange(leaderboard_key(season_id), offset, offset + limit - 1, withscores=True)
+    pipe.exists(built_key(season_id))
+    rows, built = pipe.execute()
+    if not built:
+        request_rebuild(season_id)
+    return _entries(season_id, rows, offset + 1)
+
+
+def rank_of(season_id, user_id):
+    """The player's leaderboard entry, or None if they have no rating this season."""
+    pipe = _redis().pipeline()
+    pipe.zrevrank(leaderboard_key(season_id), user_id)
+    pipe.zscore(leaderboard_key(season_id), user_id)
+    pipe.hget(names_key(season_id), user_id)
+    rank, score, username = pipe.execute()
+    if rank is None:
+        return None
+    return {
+        'rank': rank + 1,
+        'user_id': int(user_id),
+        'username': username.decode() if username else None,
+        'rating': round(score, 2),
+    }
+
+
+def around(season_id, user_id, radius=5):
+    """The player's entry with up to `radius` neighbours on each side."""
+    rank = _redis().zrevrank(leaderboard_key(season_id), user_id)
+    if rank is None:
+        return []
+    radius = max(0, min(int(radius), MAX_LIMIT // 2))
+    start = max(0, rank - radius)
+    rows = _redis().zrevrange(leaderboard_key(season_id), start, rank + radius, withscores=True)
+    return _entries(season_id, rows, start + 1)
+
+
+def rank_slice(season_id, offset, count):
+    """(user_id, rank) pairs for a slice of the board, without usernames."""
+    members = _redis().zrevrange(leaderboard_key(season_id), offset, offset + count - 1)
+    return [(int(member), offset + i) for i, member in enumerate(members, start=1)]
+
+
+def size(season_id):
+    return _redis().zcard(leaderboard_key(season_id))
+
+
+def drop(season_id):
+    """Free a finished season's board; its standings live in SeasonStanding."""
+    _redis().delete(leaderboard_key(season_id), names_key(season_id), built_key(season_id))
+
+
+def is_built(season_id):
+    return bool(_redis().exists(built_key(season_id)))
+
+
+def ensure_built(season_id):
+    """
+    Rebuild a board that was never built or was lost with Redis. One caller
+    at a time holds the rebuild lock. Returns True if this call rebuilt it.
+    """
+    if is_built(season_id):
+        return False
+    conn = _redis()
+    if not conn.set(rebuild_lock_key(season_id), 1, nx=True, ex=REBUILD_LOCK_TTL):
+        return False
+    try:
+        rebuild(season_id)
+    finally:
+        conn.delete(rebuild_lock_key(season_id))
+    return True
+
+
+def request_rebuild(season_id):
+    """
+    Queue ensure_built for a reader that found the board unbuilt. The NX key
+    lets one request through per REBUILD_REQUEST_TTL, so a cold board under
+    load queues one task rather than one per read.
+    """
+    from rankings.tasks import rebuild_leaderboard
+
+    if _redis().set(rebuild_requested_key(season_id), 1, nx=True, ex=REBUILD_REQUEST_TTL):
+        rebuild_leaderboard.delay(season_id)
+
+
+def rebuild(season_id, batch_size=REBUILD_BATCH):
+    """
+    Rebuild a season from Ranking rows in keyset batches into staging keys,
+    then swap them in with RENAME so readers never see a partial board.
+    Players synced while it runs are re-read before the swap.
+    """
+    conn = _redis()
+    staging, staging_names = f'{leaderboard_key(season_id)}:rebuild', f'{names_key(season_id)}:rebuild'
+    conn.delete(staging, staging_names, touched_key(season_id))
+
+    total, last_id = 0, 0
+    while True:
+        batch = list(
+            Ranking.objects.filter(season_id=season_id, id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'user_id', 'user__username', 'rating')[:batch_size]
+        )
+        if not batch:
+            break
+        pipe = conn.pipeline()
+        _add_entries(pipe, season_id, (row[1:] for row in batch), key=staging, names=staging_names)
+        pipe.execute()
+        total += len(batch)
+        last_id = batch[-1][0]
+
+    filled = bool(total)
+    while True:
+        with conn.pipeline() as pipe:
+            try:
+                pipe.watch(touched_key(season_id))
+                touched = pipe.smembers(touched_key(season_id))
+                if touched:
+                    pipe.unwatch()
+                    conn.srem(touched_key(season_id), *touched)
+                    rows = list(_ranking_rows(season_id, [int(user_id) for user_id in touched]))
+                    refresh = conn.pipeline()
+                    _add_entries(refresh, season_id, rows, key=staging, names=staging_names)
+                    refresh.execute()
+                    filled = filled or bool(rows)
+                    continue
+                pipe.multi()
+                if filled:
+                    pipe.rename(staging, leaderboard_key(season_id))
+                    pipe.rename(staging_names, names_key(season_id))
+                else:
+                    pipe.delete(leaderboard_key(season_id), names_key(season_id))
+                pipe.set(built_key(season_id), 1)
+                pipe.execute()
+                return total
+            except WatchError:
+                continue
@@ -0,0 +1,152 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from rankings.models import Ranking, Season, SeasonRollover
+from rankings.services.leaderboard_service import drop, rebuild
+from rankings.services.standings_service import build_standing, save_standings
+
+logger = logging.getLogger(__name__)
+
+SEASON_LENGTH_DAYS = 30
+ROLLOVER_BATCH = 5000
+BASE_RATING = 1200
+# Share of the distance from BASE_RATING a player keeps into the next season
+CARRY_OVER = 0.5
+
+
+def soft_reset(rating):
+    return BASE_RATING + (rating - BASE_RATING) * CARRY_OVER
+
+
+def previous_season(season):
+    return Season.objects.filter(start_date__lt=season.start_date).order_by('-start_date').first()
+
+
+def start_rollover(now=None):
+    """
+    Close the active season and open the next one in one transaction.
+
+    The new season is live immediately; players who battle before their row is
+    carried over get the soft-reset rating on first use (see rankings.utils),
+    and the carry stage skips rows that already exist.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        current = Season.objects.select_for_update().filter(is_active=True).first()
+        # Re-checked under the lock so two overlapping runs cannot roll twice
+        if current is None or not rollover_due(current, now):
+            return None
+        Season.objects.filter(pk=current.pk).update(is_active=False, end_date=now)
+        upcoming = Season.objects.create(
+            name=f"Season {Season.objects.count() + 1}",
+            start_date=now,
+            is_active=True,
+        )
+        return SeasonRollover.objects.create(from_season=current, to_season=upcoming)
+
+
+def _archive_batch(rollover, batch_size):
+    """Freeze the next slice of final standings, ordered by rating, into SeasonStanding."""
+    rankings = Ranking.objects.filter(season_id=rollover.from_season_id)
+    if rollover.total is None:
+        rollover.total = rankings.count()
+    if rollover.cursor_rating is not None:
+        rankings = rankings.filter(
+            Q(rating__lt=rollover.cursor_rating)
+            | Q(rating=rollover.cursor_rating, id__gt=rollover.cursor_id)
+        )
+    batch = list(
+        rankings.order_by('-rating', 'id').values_list(
+            'id', 'user_id', 'rating', 'total_matches', 'wins', 'losses'
+        )[:batch_size]
+    )
+    # Upserts over the live rows the season maintained and marks them final
+    save_standings([
+        build_standing(
+            rollover.from_season_id, user_id, rollover.processed + offset, rollover.total,
+            rating, total_matches, wins, losses, is_final=True,
+        )
+        for offset, (_, user_id, rating, total_matches, wins, losses) in enumerate(batch, start=1)
+    ])
+    if batch:
+        rollover.cursor_id, rollover.cursor_rating = batch[-1][0], batch[-1][2]
+    return len(batch)
+
+
+def _carry_batch(rollover, batch_size):
+    """Seed next-season rankings with soft-reset ratings, in id order."""
+    batch = list(
+        Ranking.objects.filter(season_id=rollover.from_season_id, id__gt=rollover.cursor_id)
+        .order_by('id')
+        .values_list('id', 'user_id', 'rating')[:batch_size]
+    )
+    Ranking.objects.bulk_create(
+        [
+            Ranking(user_id=user_id, season_id=rollover.to_season_id, rating=soft_reset(rating))
+            for _, user_id, rating in batch
+        ],
+        ignore_conflicts=True,
+    )
+    if batch:
+        rollover.cursor_id = batch[-1][0]
+    return len(batch)
+
+
+STAGE_BATCHES = {
+    'archive': _archive_batch,
+    'carry': _carry_batch,
+}
+NEXT_STAGE = {'archive': 'carry', 'carry': 'leaderboard', 'leaderboard': 'done'}
+
+
+def _advance(rollover, batch_size):
+    """
+    Run one batch of the current stage. The batch and the cursor that records
+    it commit together, so a crash between batches never repeats or skips one,
+    and concurrent runners serialize on the rollover row.
+    """
+    if rollover.stage == 'leaderboard':
+        return _finish(rollover)
+    with transaction.atomic():
+        rollover = SeasonRollover.objects.select_for_update().get(pk=rollover.pk)
+        if rollover.stage not in STAGE_BATCHES:
+            return rollover
+        copied = STAGE_BATCHES[rollover.stage](rollover, batch_size)
+        rollover.processed += copied
+        if copied < batch_size:
+            rollover.stage = NEXT_STAGE[rollover.stage]
+            rollover.cursor_id, rollover.cursor_rating, rollover.processed = 0, None, 0
+        rollover.save()
+        return rollover
+
+
+def _finish(rollover):
+    """
+    Swap the Redis boards, then mark the rollover done. The Redis work runs
+    before the rollover row is locked; rebuild and drop are idempotent, so a
+    runner that dies in between simply repeats them.
+    """
+    rebuild(rollover.to_season_id)
+    drop(rollover.from_season_id)
+    with transaction.atomic():
+        rollover = SeasonRollover.objects.select_for_update().get(pk=rollover.pk)
+        if rollover.stage == 'leaderboard':
+            rollover.stage, rollover.finished_at = 'done', timezone.now()
+            rollover.save()
+        return rollover
+
+
+def run_rollover(rollover, batch_size=ROLLOVER_BATCH):
+    """Drive a rollover to completion from wherever it last stopped."""
+    while rollover.stage != 'done':
+        rollover = _advance(rollover, batch_size)
+        logger.info(f"[ROLLOVER] {rollover}: {rollover.processed} rows in stage")
+    return rollover
+
+
+def rollover_due(season, now=None):
+    now = now or timezone.now()
+    return (now - season.start_date).days >= SEASON_LENGTH_DAYS
@@ -0,0 +1,110 @@
+"""
+Materialized season standings.
+
+SeasonStanding carries rank, percentile and tier, so profile pages and the
+admin dashboard read a player's placing with one indexed lookup instead of
+counting everyone rated above them. While a season runs, rows are refreshed
+from the Redis leaderboard: incrementally for the players a settlement
+touched, and in full on a schedule so everyone else's rank catches up with
+players who moved past them. The rollover archive writes the final rows.
+"""
+
+from rankings.models import Ranking, Season, SeasonStanding
+from rankings.services import leaderboard_service
+
+REFRESH_BATCH = 5000
+STANDING_FIELDS = ['rank', 'rating', 'total_matches', 'wins', 'losses', 'percentile', 'tier', 'is_final']
+
+# (top share of players, tier), best first
+TIER_CUTOFFS = (
+    (0.01, 'grandmaster'),
+    (0.05, 'master'),
+    (0.15, 'diamond'),
+    (0.35, 'platinum'),
+    (0.60, 'gold'),
+    (0.85, 'silver'),
+)
+
+
+def percentile_for(rank, total):
+    return round(100 * (total - rank + 1) / total, 2) if total else 0
+
+
+def tier_for(rank, total):
+    share = rank / total if total else 1
+    for cutoff, tier in TIER_CUTOFFS:
+        if share <= cutoff:
+            return tier
+    return 'bronze'
+
+
+def build_standing(season_id, user_id, rank, total, rating, total_matches, wins, losses, is_final=False):
+    return SeasonStanding(
+        season_id=season_id,
+        user_id=user_id,
+        rank=rank,
+        rating=rating,
+        total_matches=total_matches,
+        wins=wins,
+        losses=losses,
+        percentile=percentile_for(rank, total),
+        tier=tier_for(rank, total),
+        is_final=is_final,
+    )
+
+
+def save_standings(standings):
+    """Upsert on (season, user); a single INSERT ... ON CONFLICT per batch."""
+    SeasonStanding.objects.bulk_create(
+        standings,
+        update_conflicts=True,
+        unique_fields=['season', 'user'],
+        update_fields=STANDING_FIELDS + ['updated_at'],
+    )
+
+
+def _write(season_id, ranks, total):
+    """ranks: {user_id: rank}; stats come from the players' Ranking rows."""
+    stats = Ranking.objects.filter(season_id=season_id, user_id__in=list(ranks)).values_list(
+        'user_id', 'rating', 'total_matches', 'wins', 'losses'
+    )
+    save_standings([
+        build_standing(season_id, user_id, ranks[user_id], total, rating, total_matches, wins, losses)
+        for user_id, rating, total_matches, wins, losses in stats
+    ])
+
+
+def refresh_players(season_id, user_ids):
+    """Re-materialize the standings of the players a settlement just rated."""
+    total = leaderboard_service.size(season_id)
+    ranks = {}
+    for user_id in user_ids:
+        entry = leaderboard_service.rank_of(season_id, user_id)
+        if entry:
+            ranks[user_id] = entry['rank']
+    if ranks:
+        _write(season_id, ranks, total)
+
+
+def refresh_season(season_id, batch_size=REFRESH_BATCH):
+    """Re-materialize a running season in leaderboard order, one batch at a time."""
+    total = leaderboard_service.size(season_id)
+    for offset in range(0, total, batch_size):
+        # Stop once the season closes; the rollover archive owns its rows from then on
+        if not Season.objects.filter(pk=season_id, is_active=True).exists():
+            break
+        _write(season_id, dict(leaderboard_service.rank_slice(season_id, offset, batch_size)), total)
+    return total
+
+
+def standing_for(season_id, user_id):
+    return SeasonStanding.objects.filter(season_id=season_id, user_id=user_id).first()
+
+
+def standings_page(season_id, after_rank=0, limit=100):
+    """Keyset page of a season's standings by rank."""
+    return list(
+        SeasonStanding.objects.filter(season_id=season_id, rank__gt=after_rank)
+        .order_by('rank')
+        .values('rank', 'user__username', 'rating', 'percentile', 'tier', 'wins', 'losses', 'is_final')[:limit]
+    )
@@ -1,33 +1,57 @@
 from celery import shared_task
 from django.utils import timezone
-from .models import Season
+from .models import Season, SeasonRollover
+from .services.leaderboard_service import active_season_id, ensure_built
+from .services.season_service import rollover_due, run_rollover, start_rollover
+from .services.standings_service import refresh_season
 
 @shared_task
 def check_and_create_new_season():
-    now = timezone.now()
+    """
+    Runs hourly. Finishes an interrupted rollover first, then rolls the active
+    season over once it is SEASON_LENGTH_DAYS old.
+    """
+    pending = SeasonRollover.objects.exclude(stage='done').order_by('started_at').first()
+    if pending:
+        run_rollover(pending)
+        return f'[SEASON-TASK] Resumed rollover {pending.from_season_id} -> {pending.to_season_id}.'
 
-    # Check if there's an active season
     active_season = Season.objects.filter(is_active=True).first()
 
-    if active_season:
-        # If the season is over, close it and start a new one
-        season_duration_days = 30  # or 45, or from settings
-        if (now - active_season.start_date).days >= season_duration_days:
-            active_season.is_active = False
-            active_season.end_date = now
-            active_season.save()
-
-            # Create the new season
-            new_season_number = Season.objects.count() + 1
-            Season.objects.create(
-                name=f"Season {new_season_number}",
-                start_date=now,
-                is_active=True
-            )
-    else:
+    if active_season is None:
         # If no season exists, create the first one
         Season.objects.create(
             name="Season 1",
-            start_date=now,
+            start_date=timezone.now(),
             is_active=True
         )
+        return '[SEASON-TASK] Created Season 1.'
+
+    if not rollover_due(active_season):
+        return '[SEASON-TASK] Active season still running.'
+
+    rollover = start_rollover()
+    if rollover:
+        run_rollover(rollover)
+    return f'[SEASON-TASK] Rolled over {active_season.name}.'
+
+
+@shared_task
+def refresh_season_standings():
+    """Catch every player's materialized rank up with the live leaderboard."""
+    season_id = active_season_id()
+    if season_id is None:
+        return '[STANDINGS-TASK] No active season.'
+    refreshed = refresh_season(season_id)
+    return f'[STANDINGS-TASK] {refreshed} standings refreshed for season {season_id}.'
+
+
+@shared_task
+def rebuild_leaderboard(season_id=None):
+    """Seed a season's Redis board from Ranking rows if it was never built or was lost."""
+    season_id = season_id or active_season_id()
+    if season_id is None:
+        return '[LEADERBOARD-TASK] No active season.'
+    if ensure_built(season_id):
+        return f'[LEADERBOARD-TASK] Rebuilt the board for season {season_id}.'
+    return f'[LEADERBOARD-TASK] Board for season {season_id} already built.'
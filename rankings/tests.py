@@ -1,3 +1,37 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from rankings.services.season_service import soft_reset
+from rankings.services.standings_service import percentile_for, tier_for
+from rankings.utils import actual_scores, expected_scores, rating_deltas
+
+
+class EloTests(SimpleTestCase):
+
+    def test_equal_ratings_expect_an_even_result(self):
+        self.assertEqual(expected_scores([1200, 1200, 1200]), [0.5, 0.5, 0.5])
+
+    def test_placements_score_each_pairwise_result(self):
+        self.assertEqual(actual_scores([1, 2, 2]), [1.0, 0.25, 0.25])
+
+    def test_rating_changes_are_zero_sum(self):
+        deltas = rating_deltas([1500, 1200, 1100], [2, 1, 3])
+
+        self.assertAlmostEqual(sum(deltas), 0)
+        self.assertGreater(deltas[1], 0)
+        self.assertLess(deltas[0], 0)
+
+
+class SeasonTests(SimpleTestCase):
+
+    def test_soft_reset_halves_the_distance_from_base(self):
+        self.assertEqual(soft_reset(1600), 1400)
+        self.assertEqual(soft_reset(1000), 1100)
+
+
+class StandingsTests(SimpleTestCase):
+
+    def test_tiers_and_percentiles_follow_rank(self):
+        self.assertEqual(tier_for(1, 1000), 'grandmaster')
+        self.assertEqual(tier_for(1000, 1000), 'bronze')
+        self.assertEqual(percentile_for(1, 1000), 100)
+        self.assertEqual(percentile_for(1000, 1000), 0.1)
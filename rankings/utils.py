@@ -1,156 +1,155 @@
 from django.db import transaction
+from battle.models import BattleSubmission
+from room.models import RoomParticipant
 from .models import Ranking, Season
-from django.conf import settings
-from math import pow
-from authentication.models import CustomUser
-from room.models import Room
-def calculate_elo_1v1(room_id, winner_id):
-     
+from .services.season_service import previous_season, soft_reset
 
-    room = Room.objects.get(room_id=room_id)
-    participants = list(room.participants.all())
+K_FACTOR = 32
+# Rooms of this size and up are rated as teams; 2 is 1v1, anything between a squad
+TEAM_MIN_CAPACITY = 6
 
-    if len(participants) != 2:
-        raise ValueError("1v1 room must have exactly 2 participants.")
 
-    # Get winner and loser as real user objects
-    winner = CustomUser.objects.get(user_id=winner_id)
-    loser = [p for p in participants if p.user.user_id != winner_id][0].user
-
-    # Get current season
-    season = Season.objects.filter(is_active=True).first()
-    if not season:
-        raise ValueError("No active season found.")
-
-    winner_rank, _ = Ranking.objects.get_or_create(user=winner, season=season)
-    loser_rank, _ = Ranking.objects.get_or_create(user=loser, season=season)
-
-    K = 32
-    expected_winner = 1 / (1 + pow(10, (loser_rank.rating - winner_rank.rating) / 400))
-    expected_loser = 1 / (1 + pow(10, (winner_rank.rating - loser_rank.rating) / 400))
-
-    with transaction.atomic():
-        winner_rank.rating += K * (1 - expected_winner)
-        loser_rank.rating += K * (0 - expected_loser)
-        winner_rank.wins += 1
-        loser_rank.losses += 1
-        winner_rank.total_match += 1
-        loser_rank.total_match += 1
-        winner_rank.save()
-        loser_rank.save()
-
-
-def calculate_elo_squad(battle):
+def expected_scores(ratings):
     """
-    Updates the ratings for all participants in a squad battle using an
-    Elo-like rating system adapted for multiple players.
+    Mean Elo expectation of every entry against all the others.
 
-    Args:
-        battle: A Battle instance containing multiple participants (3 to 5 players).
+    Row i of the pairwise matrix E[i][j] = 1 / (1 + 10^((r_j - r_i) / 400));
+    the diagonal is skipped and each row is averaged over the n - 1 opponents.
     """
-    
-    # Convert participants QuerySet to a list for easy iteration
-    participants = list(battle.participants.all())
+    n = len(ratings)
+    return [
+        sum(1 / (1 + 10 ** ((r_j - r_i) / 400)) for j, r_j in enumerate(ratings) if j != i) / (n - 1)
+        for i, r_i in enumerate(ratings)
+    ]
 
-    # K-factor: determines how much the rating changes after a game
-    k_factor = 32  
 
-    # Loop through each participant to update their rating
-    for player in participants:
-        # Get this player's ranking for the current season
-        player_rank = Ranking.objects.get(user=player.user, season=battle.season)
-
-        # -------------------------------
-
-        # Expected score is based on comparing this player to every other opponent
-        expected = 0
-        for opponent in participants:
-            if opponent == player:
-                continue  # Don't compare a player to themselves
-
-            opponent_rank = Ranking.objects.get(user=opponent.user, season=battle.season)
-
-            # Elo formula for expected score vs this opponent
-            expected += 1 / (1 + 10 ** ((opponent_rank.rating - player_rank.rating) / 400))
-
-        # Average the expected score over all opponents
-        expected /= (len(participants) - 1)
+def actual_scores(placements):
+    """
+    Mean pairwise result of every entry: 1 per opponent finished ahead of,
+    0.5 per tie, 0 per opponent behind. Lower placement is better.
+    """
+    n = len(placements)
+    return [
+        sum(1 if p_i < p_j else 0.5 if p_i == p_j else 0 for j, p_j in enumerate(placements) if j != i) / (n - 1)
+        for i, p_i in enumerate(placements)
+    ]
 
-        # ------------------------------
 
-        # Position → score between 0 and 1
-        # Example: if there are 4 players, position 1 gets 1.0, position 4 gets 0.0
-        actual = (len(participants) - player.position) / (len(participants) - 1)
+def rating_deltas(ratings, placements, k_factor=K_FACTOR):
+    expected = expected_scores(ratings)
+    actual = actual_scores(placements)
+    return [k_factor * (a - e) for a, e in zip(actual, expected)]
 
-        # ------------------------------
 
-        player_rank.rating += k_factor * (actual - expected)
-        player_rank.total_matches += 1
+def _load_rankings(season, user_ids):
+    """
+    All rankings for the players in one locked query. Missing rows are created,
+    starting from the soft-reset rating of the player's previous season.
+    """
+    rankings = {
+        r.user_id: r
+        for r in Ranking.objects.select_for_update().filter(season=season, user_id__in=user_ids)
+    }
+    missing_ids = [user_id for user_id in user_ids if user_id not in rankings]
+    if missing_ids:
+        last_season = previous_season(season)
+        carried = dict(Ranking.objects.filter(
+            season=last_season, user_id__in=missing_ids
+        ).values_list('user_id', 'rating')) if last_season else {}
+        missing = [
+            Ranking(user_id=user_id, season=season, rating=soft_reset(carried[user_id]))
+            if user_id in carried else Ranking(user_id=user_id, season=season)
+            for user_id in missing_ids
+        ]
+        for ranking in Ranking.objects.bulk_create(missing):
+            rankings[ranking.user_id] = ranking
+    return rankings
+
+
+def apply_ratings(placements, teams=None, season=None, k_factor=K_FACTOR):
+    """
+    Rate one battle and persist every player's new ranking with one bulk_update.
 
-        # Track wins/losses for stats
-        if player.position == 1:
-            player_rank.wins += 1
-        else:
-            player_rank.losses += 1
+    `placements` maps user_id -> finishing place (1 is best, ties allowed).
+    With `teams` (a list of user_id lists) the teams are rated against each
+    other on their average rating and every member receives the team's change.
+    Returns {user_id: rating delta}.
+    """
+    if len(placements) < 2:
+        return {}
+    season = season or Season.objects.filter(is_active=True).first()
+    if not season:
+        raise ValueError("No active season found.")
 
-        # Save updated ranking
-        player_rank.save()
+    with transaction.atomic():
+        rankings = _load_rankings(season, list(placements))
+        groups = teams if teams and len(teams) > 1 else [[user_id] for user_id in placements]
+        group_ratings = [sum(rankings[u].rating for u in group) / len(group) for group in groups]
+        group_places = [min(placements[u] for u in group) for group in groups]
+        deltas, places = {}, {}
+        for group, place, delta in zip(groups, group_places, rating_deltas(group_ratings, group_places, k_factor)):
+            for user_id in group:
+                deltas[user_id] = delta
+                places[user_id] = place
+
+        for user_id, ranking in rankings.items():
+            ranking.rating += deltas[user_id]
+            ranking.total_matches += 1
+            if places[user_id] == 1:
+                ranking.wins += 1
+            else:
+                ranking.losses += 1
+        Ranking.objects.bulk_update(rankings.values(), ['rating', 'total_matches', 'wins', 'losses'])
+    return deltas
 
 
-def calculate_elo_team(battle):
+def battle_placements(room):
     """
-    Update ratings for a team-based battle using the Elo rating system.
-
-    Steps:
-    1. Calculate average rating for each team.
-    2. Compare each team against all others to get expected score.
-    3. Update each member's rating based on the team's actual result.
+    user_id -> place for everyone who took part: finishers by submission
+    position, everyone else who was in the room at the start tied for last.
     """
+    placements = dict(BattleSubmission.objects.filter(room=room).values_list('user_id', 'position'))
+    for user_id in RoomParticipant.objects.filter(room=room).in_battle().values_list('user_id', flat=True):
+        placements.setdefault(user_id, None)
+    # Behind every submission position, and never 1, so a battle nobody finished has no winner
+    last = len(placements) + 1
+    return {user_id: place or last for user_id, place in placements.items()}
 
-    k_factor = 32  # Controls rating change speed
-
-    # Step 1: Group participants by team
-    teams = {}  # {team_id: [participants]}
-    for participant in battle.participants.all():
-        teams.setdefault(participant.team_id, []).append(participant)
 
-    # Step 2: Calculate average rating for each team
-    team_ratings = {}
-    for team_id, members in teams.items():
-        total_rating = 0
-        for member in members:
-            member_rank = Ranking.objects.get(user=member.user, season=battle.season)
-            total_rating += member_rank.rating
-        team_ratings[team_id] = total_rating / len(members)  # average rating
-
-    # Step 3: Update ratings for each team
-    for team_id, members in teams.items():
-        team_rating = team_ratings[team_id]
+def winning_team(placements, winner_slots):
+    """
+    The finishers in the first `winner_slots` positions. Players who never
+    submitted share the last place battle_placements gives them and never
+    fill an empty slot, however few players finished.
+    """
+    last = len(placements) + 1
+    return [user_id for user_id, place in placements.items() if place < last and place <= winner_slots]
 
-        # Calculate expected score vs all other teams
-        expected = 0
-        for opp_team_id, opp_members in teams.items():
-            if opp_team_id == team_id:
-                continue
-            opp_rating = team_ratings[opp_team_id]
-            expected += 1 / (1 + 10 ** ((opp_rating - team_rating) / 400))
 
-        expected /= (len(teams) - 1)  # Average expectation
+def battle_winners(room, placements, winner_slots):
+    """Players credited with a win: the winning team in a team battle, first place otherwise."""
+    if room.capacity >= TEAM_MIN_CAPACITY:
+        return winning_team(placements, winner_slots)
+    return [user_id for user_id, place in placements.items() if place == 1]
 
-        # Actual score (1 = win, 0 = loss, 0.5 = draw)
-        # Here, position=1 means first place
-        team_position = members[0].team_position  # Same for all team members
-        actual = (len(teams) - team_position) / (len(teams) - 1)
 
-        # Step 4: Update each member's rating
-        for member in members:
-            member_rank = Ranking.objects.get(user=member.user, season=battle.season)
-            member_rank.rating += k_factor * (actual - expected)
-            member_rank.total_matches += 1
+def calculate_elo_team(room, winner_slots, placements=None):
+    """
+    Rooms carry no team assignment, so a team battle is rated as the
+    `winner_slots` finishers against everyone else.
+    """
+    placements = placements or battle_placements(room)
+    winners = winning_team(placements, winner_slots)
+    rest = [user_id for user_id in placements if user_id not in winners]
+    return apply_ratings(placements, teams=[team for team in (winners, rest) if team])
 
-            if team_position == 1:
-                member_rank.wins += 1
-            else:
-                member_rank.losses += 1
 
-            member_rank.save()
+def calculate_elo(room, winner_slots=1, placements=None):
+    """
+    Rate a finished battle. 1v1 and squad battles are free-for-all placements
+    on the same engine; larger rooms go through calculate_elo_team.
+    """
+    placements = placements or battle_placements(room)
+    if room.capacity >= TEAM_MIN_CAPACITY:
+        return calculate_elo_team(room, winner_slots, placements)
+    return apply_ratings(placements)
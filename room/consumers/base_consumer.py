@@ -1,24 +1,127 @@
-import json
+import time
+from collections import deque
+
 from channels.generic.websocket import AsyncWebsocketConsumer
+from room.utils.broadcast import broadcast
+from room.utils.encoding import JSON, decode_frame, encode_frame, encode_group_frame, negotiate_encoding
 from room.utils.error_handler import send_error
+from room.utils.rate_limit import ConnectionRateLimiter
 
 class BaseConsumer(AsyncWebsocketConsumer):
+    encoding = JSON
+
+    # message type -> (tokens per second, burst); anything else gets the default
+    rate_limits = {}
+    default_rate_limit = (5, 20)
+    # Refused frames tolerated per window before the socket is closed
+    max_rate_violations = 50
+    rate_violation_window = 60
+
+    # State snapshots where only the newest one matters to a lagging client
+    coalesce_types = frozenset({
+        'lobby_state', 'participant_list', 'participant_update', 'time_update', 'room_update', 'room_list',
+    })
+    outbound_limit = 64
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = ConnectionRateLimiter(self.rate_limits, self.default_rate_limit)
+        self.rate_violations = 0
+        self._violations_since = time.monotonic()
+        self._outbox = deque()
+        self._sending = False
+
+    async def accept(self, subprotocol=None):
+        self.encoding, negotiated = negotiate_encoding(self.scope)
+        await super().accept(subprotocol or negotiated)
+
     async def send_json(self, data):
         try:
-            await self.send(text_data=json.dumps(data))
+            await self.send_encoded(encode_frame(data, self.encoding), data.get('type'))
         except Exception as e:
             await self.close(code=4000, reason=f"Error sending data: {str(e)}")
 
-    async def receive(self, text_data):
+    async def send_encoded(self, frame, frame_type=None):
+        """
+        Write a frame, queueing it while an earlier write is still in flight.
+
+        The queue is bounded: a newer snapshot replaces a queued one of the
+        same type, and a client that falls `outbound_limit` frames behind is
+        disconnected so it can reconnect and resync instead of buffering
+        forever.
+        """
+        if self._sending:
+            if frame_type in self.coalesce_types:
+                for index, (queued_type, _) in enumerate(self._outbox):
+                    if queued_type == frame_type:
+                        del self._outbox[index]
+                        break
+            if len(self._outbox) >= self.outbound_limit:
+                self._outbox.clear()
+                await self.close(code=4008, reason="Client too slow")
+                return
+            self._outbox.append((frame_type, frame))
+            return
+
+        self._sending = True
         try:
-            text_data_json = json.loads(text_data)
-            await self.handle_message(text_data_json)
-        except json.JSONDecodeError:
-            await send_error(self, "Invalid JSON format")
+            await self._write(frame)
+            while self._outbox:
+                _, queued = self._outbox.popleft()
+                await self._write(queued)
+        finally:
+            self._sending = False
+
+    async def _write(self, frame):
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def broadcast_frame(self, group_name, data):
+        """Encode a frame once in the sender and fan it out to a group."""
+        await broadcast(group_name, data)
+
+    async def send_frame(self, event):
+        """Forward a group frame in this connection's encoding, encoded once per process."""
+        try:
+            await self.send_encoded(encode_group_frame(event, self.encoding), event.get('frame_type'))
+        except Exception as e:
+            await self.close(code=4000, reason=f"Error sending data: {str(e)}")
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = decode_frame(text_data, bytes_data, self.encoding)
+        except ValueError:
+            await self.handle_invalid_frame()
+            return
+        if not isinstance(data, dict):
+            await self.handle_invalid_frame()
+            return
+
+        if not self.rate_limiter.allow(data.get('type')):
+            # Count per window so a long-lived, mostly polite client is not
+            # eventually closed for occasional bursts
+            now = time.monotonic()
+            if now - self._violations_since >= self.rate_violation_window:
+                self.rate_violations = 0
+                self._violations_since = now
+            self.rate_violations += 1
+            if self.rate_violations > self.max_rate_violations:
+                await self.close(code=4029, reason="Rate limit exceeded")
+                return
+            await send_error(self, f"Rate limit exceeded for {data.get('type')}")
+            return
+
+        await self.handle_message(data)
+
+    async def handle_invalid_frame(self):
+        await send_error(self, "Invalid JSON format")
 
     async def handle_message(self, data):
         await send_error(self, "Message type not supported")
 
     async def disconnect(self, close_code):
+        self._outbox.clear()
         if hasattr(self, 'group_name') and hasattr(self, 'channel_name'):
-            await self.channel_layer.group_discard(self.group_name, self.channel_name)
\ No newline at end of file
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from room.consumers.base_consumer import BaseConsumer
+from room.services.matchmaking_service import MODES, QUEUE_TTL, dequeue, enqueue, queue_status, refresh_queue
+from room.utils.auth import WebSocketAuthMixin
+from room.utils.broadcast import matchmaking_group_name
+from room.utils.error_handler import send_error
+
+logger = logging.getLogger(__name__)
+
+
+class MatchmakingConsumer(BaseConsumer, WebSocketAuthMixin):
+    """Queue socket: join/leave a mode and receive `match_found` on its own per-user group."""
+    rate_limits = {
+        'join_queue': (0.5, 3),
+        'leave_queue': (0.5, 3),
+        'queue_status': (1, 5),
+        'ping': (1, 5),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = None
+        self.heartbeat_task = None
+
+    async def connect(self):
+        user = await self.authenticate_user(self.scope['query_string'])
+        if user is None:
+            return
+        self.user = user
+        self.group_name = matchmaking_group_name(user.user_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        self.heartbeat_task = asyncio.create_task(self._queue_heartbeat())
+        await self.send_json({'type': 'queue_status', **await sync_to_async(queue_status)(user.user_id)})
+
+    async def _queue_heartbeat(self):
+        """Keep a queued player queued while this socket is alive; a no-op otherwise."""
+        while True:
+            await asyncio.sleep(QUEUE_TTL / 3)
+            try:
+                await sync_to_async(refresh_queue)(self.user.user_id)
+            except Exception as e:
+                logger.error(f"[MATCHMAKING] Heartbeat failed for user {self.user.user_id}: {str(e)}")
+
+    async def disconnect(self, close_code):
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        # A closed socket cannot be told about a match, so it leaves the queue
+        if self.user:
+            await sync_to_async(dequeue)(self.user.user_id)
+        await super().disconnect(close_code)
+
+    async def handle_message(self, data):
+        message_type = data.get('type')
+        if message_type == 'join_queue':
+            mode = data.get('mode')
+            if mode not in MODES:
+                await send_error(self, f"Unknown mode: {mode}")
+                return
+            if not await sync_to_async(enqueue)(self.user.user_id, mode):
+                await send_error(self, "Already in a queue")
+                return
+            await self.send_json({'type': 'queue_status', **await sync_to_async(queue_status)(self.user.user_id)})
+        elif message_type == 'leave_queue':
+            await sync_to_async(dequeue)(self.user.user_id)
+            await self.send_json({'type': 'queue_status', 'state': 'idle'})
+        elif message_type == 'queue_status':
+            await self.send_json({'type': 'queue_status', **await sync_to_async(queue_status)(self.user.user_id)})
+        elif message_type == 'ping':
+            await self.send_json({'type': 'pong'})
+        else:
+            await send_error(self, f"Unknown message type: {message_type}")
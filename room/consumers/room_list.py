@@ -1,12 +1,21 @@
+from django.conf import settings
 from room.consumers.base_consumer import BaseConsumer
 from room.utils.auth import WebSocketAuthMixin
-from room.services.room_service import get_room_list
+from room.services.directory_service import PAGE_SIZE, clean_filters
+from room.services.room_service import get_room_page
 from room.utils.error_handler import send_error
+from room.utils.broadcast import ROOMS_GROUP
 
 class RoomConsumer(BaseConsumer, WebSocketAuthMixin):
+    channel_layer_alias = settings.ROOMS_CHANNEL_LAYER
+    rate_limits = {
+        'request_room_list': (0.5, 3),
+        'ping': (1, 5),
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.group_name = 'rooms'
+        self.group_name = ROOMS_GROUP
         self.user_authenticated = False
 
     async def connect(self):
@@ -29,24 +38,20 @@ class RoomConsumer(BaseConsumer, WebSocketAuthMixin):
     async def handle_message(self, data):
         message_type = data.get('type')
         if message_type == 'request_room_list':
-            await self.send_room_list()
+            await self.send_room_list(data)
         elif message_type == 'ping':
             await self.send_json({'type': 'pong'})
         else:
             await send_error(self, f"Unknown message type: {message_type}")
 
-    async def room_update(self, event):
-        await self.send_json({
-            'type': 'room_update',
-            'rooms': event['rooms']
-        })
-
-    async def send_room_list(self):
+    async def send_room_list(self, data=None):
+        """One directory page; `data` may carry filters, `cursor` and `limit`."""
+        data = data or {}
         try:
-            rooms = await get_room_list()
+            page = await get_room_page(clean_filters(data), data.get('cursor'), data.get('limit', PAGE_SIZE))
             await self.send_json({
                 'type': 'room_list',
-                'rooms': rooms
+                **page,
             })
         except Exception as e:
             await send_error(self, f"Error sending room list: {str(e)}")
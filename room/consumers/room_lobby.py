@@ -1,22 +1,35 @@
-import asyncio
 import logging
 from django.utils import timezone
 from room.consumers.base_consumer import BaseConsumer
-from room.services.room_service import get_room, close_room, get_room_list
+from room.services.room_service import get_room, close_room
 from room.services.participant_service import (
     ensure_participant, get_participants, check_participant, update_participant_status,
     update_ready_status, kick_participant
 )
-from room.services.chat_service import save_chat_message, get_chat_history, clear_chat_messages
+from room.services.countdown_service import (
+    DEFAULT_COUNTDOWN, schedule_battle_start, cancel_battle_start, is_countdown_pending
+)
+from room.services.lobby_state_service import (
+    get_lobby_state, queue_lobby_state, queue_room_list_refresh
+)
+from room.services.chat_service import (
+    CHAT_HISTORY_LIMIT, save_chat_message, get_chat_history, clear_chat_messages
+)
 from room.utils.auth import WebSocketAuthMixin
+from room.utils.presence import PresenceMixin
 from room.utils.error_handler import send_error
 from room.utils.error_codes import ERRORS
-import json
 
 logger = logging.getLogger(__name__)
 
-class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
-
+class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin, PresenceMixin):
+    rate_limits = {
+        'chat_message': (1, 5),
+        'request_participants': (0.5, 3),
+        'request_chat_history': (1, 5),
+        'ready_toggle': (2, 5),
+        'ping': (1, 5),
+    }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -49,32 +62,32 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
                 return
 
         logger.info(f"[CONNECT] User {user.username} joined room {self.room_id}")
-        await ensure_participant(self.room_id, user, 'joined')
+        if not await ensure_participant(self.room_id, user, 'joined'):
+            await self._send_error('ROOM_FULL')
+            return
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
+        await self.start_presence(self.room_id, user)
 
         await self._send_and_broadcast_system_message(f"{user.username} joined the lobby")
-        await self._broadcast_participant_list()
+        await queue_lobby_state(self.room_id, {'type': 'participant_joined', 'username': user.username})
+        await self._trigger_room_update()
         await self.send_chat_history()
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection and update participant status."""
         if self.user and self.user.is_authenticated:
             logger.info(f"[DISCONNECT] User {self.user.username} left room {self.room_id}")
+            await self.stop_presence()
             await self._handle_participant_leave()
         await super().disconnect(close_code)
 
-    async def receive(self, text_data):
-        """Handle incoming WebSocket messages."""
-        try:
-            data = json.loads(text_data)
-            logger.debug(f"[RECEIVE] Room {self.room_id} message: {data}")
-            await self.handle_message(data)
-        except json.JSONDecodeError:
-            await self._send_error('INVALID_MESSAGE_FORMAT')
+    async def handle_invalid_frame(self):
+        await self._send_error('INVALID_MESSAGE_FORMAT')
 
     async def handle_message(self, data):
         """Route incoming messages to appropriate handlers."""
+        logger.debug(f"[RECEIVE] Room {self.room_id} message: {data}")
         message_type = data.get('type')
         handlers = {
             'request_participants': self.handle_request_participants,
@@ -94,8 +107,13 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
             await self._send_error('UNKNOWN_MESSAGE_TYPE', message_type)
 
     async def handle_request_participants(self, data):
-        """Send the current participant list to the client."""
-        await self._broadcast_participant_list()
+        """Send the current lobby state to the requesting client only."""
+        state = await get_lobby_state(self.room_id)
+        if not state:
+            await self._send_error('ROOM_NOT_FOUND')
+            return
+        state['events'] = []
+        await self.send_json(state)
 
     async def handle_chat_message(self, data):
         """Handle and broadcast a chat message."""
@@ -125,11 +143,11 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
         success = await kick_participant(self.room_id, target_username)
         if success:
             await self._send_and_broadcast_system_message(f"{target_username} has been kicked")
-            await self._broadcast_participant_list()
             await self._broadcast({
                 'type': 'kicked',
                 'username': target_username,
             })
+            await queue_lobby_state(self.room_id, {'type': 'participant_kicked', 'username': target_username})
             await self._trigger_room_update()
         else:
             await self._send_error('KICK_FAILED', target_username)
@@ -138,7 +156,7 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
         """Toggle the ready status of a participant."""
         ready = data.get('ready', False)
         await update_ready_status(self.room_id, self.user, ready)
-        await self._broadcast({
+        await queue_lobby_state(self.room_id, {
             'type': 'ready_status',
             'username': self.user.username,
             'ready': ready,
@@ -165,6 +183,10 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
                 await self._send_error('RANKED_NOT_READY')
                 return
 
+        if await is_countdown_pending(self.room_id):
+            await self._send_error('COUNTDOWN_IN_PROGRESS')
+            return
+
         logger.info(f"[START_COUNTDOWN] Room {self.room_id} starting with question {room.active_question.id}")
 
         await self._broadcast({
@@ -177,23 +199,8 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
             }
         })
 
-        countdown = data.get('countdown', 5)
-        for i in range(countdown, -1, -1):
-            await self._broadcast({
-                'type': 'countdown',
-                'countdown': i,
-                'is_ranked': room.is_ranked,
-            })
-            await asyncio.sleep(1)
-
-        logger.info(f"[BATTLE_STARTED] Room {self.room_id} navigating to battle with question {room.active_question.id}")
-        await self._broadcast({
-            'type': 'battle_started',
-            'room_id': str(room.room_id),
-            'question': {
-                'id': room.active_question.id,
-            }
-        })
+        if await schedule_battle_start(room, data.get('countdown', DEFAULT_COUNTDOWN)) is None:
+            await self._send_error('COUNTDOWN_IN_PROGRESS')
 
     async def handle_close_room(self, data):
         """Close the room and clear chat (host only)."""
@@ -202,6 +209,7 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
             return
         success = await close_room(self.room_id)
         if success:
+            await cancel_battle_start(self.room_id)
             await self._send_and_broadcast_system_message("Room closed. Chat cleared.")
             await self._broadcast({
                 'type': 'room_closed',
@@ -220,8 +228,8 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
         await self.send_json({'type': 'pong'})
 
     async def handle_request_chat_history(self, data):
-        """Send the chat history to the client."""
-        await self.send_chat_history()
+        """Send a page of chat history; `before` pages further back."""
+        await self.send_chat_history(before=data.get('before'), limit=data.get('limit', CHAT_HISTORY_LIMIT))
 
     async def _send_error(self, error_key, *args):
         """Send an error message using the centralized error codes."""
@@ -249,50 +257,21 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
             'is_system': True,
         })
 
-    async def _broadcast_participant_list(self):
-        """Broadcast the current participant list and room details."""
-        room = await self._get_valid_room()
-        if not room:
-            return
-        participants = await get_participants(self.room_id)
-        await self._broadcast({
-            'type': 'participant_list',
-            'participants': participants,
-            'is_ranked': room.is_ranked,
-        })
-
     async def _handle_participant_leave(self):
         """Handle participant leaving and broadcast updates."""
         participants = await update_participant_status(self.room_id, self.user, 'left')
         if participants:
             await self._send_and_broadcast_system_message(f"{self.user.username} left the lobby")
-            await self._broadcast({
-                'type': 'participant_update',
-                'participants': participants,
-            })
-            await self._broadcast({
-                'type': 'participant_left',
-                'username': self.user.username,
-            })
+            await queue_lobby_state(self.room_id, {'type': 'participant_left', 'username': self.user.username})
             await self._trigger_room_update()
 
     async def _broadcast(self, message):
-        """Broadcast a message to the room group."""
-        await self.channel_layer.group_send(self.room_group_name, message)
+        """Broadcast a message to the room group, encoded once for all recipients."""
+        await self.broadcast_frame(self.room_group_name, message)
 
     async def _trigger_room_update(self):
-        """Trigger an update to the room list for all clients."""
-        try:
-            rooms = await get_room_list()
-            await self.channel_layer.group_send(
-                'rooms',
-                {
-                    'type': 'room_update',
-                    'rooms': rooms,
-                }
-            )
-        except Exception as e:
-            logger.error(f"[ERROR] Error triggering room update: {str(e)}")
+        """Queue a room list refresh; changes within one tick share a frame."""
+        await queue_room_list_refresh()
 
     async def is_host(self):
         """Check if the current user is the host of the room."""
@@ -302,44 +281,13 @@ class RoomLobbyConsumer(BaseConsumer, WebSocketAuthMixin):
             for p in participants
         )
 
-    async def send_chat_history(self):
-        """Send the chat history to the connected client."""
-        messages = await get_chat_history(self.room_id)
+    async def send_chat_history(self, before=None, limit=CHAT_HISTORY_LIMIT):
+        """Send one page of chat history to the connected client."""
+        page = await get_chat_history(self.room_id, before=before, limit=limit)
         await self.send_json({
             'type': 'chat_history',
-            'messages': messages,
+            'messages': page['messages'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'before': before,
         })
-
-    # Message handlers for group messages
-    async def chat_message(self, event):
-        await self.send_json(event)
-
-    async def participant_list(self, event):
-        await self.send_json(event)
-
-    async def participant_update(self, event):
-        await self.send_json(event)
-
-    async def ready_status(self, event):
-        await self.send_json(event)
-
-    async def battle_ready(self, event):
-        logger.debug(f"[BATTLE_READY] Forwarding to room {self.room_id}: {event}")
-        await self.send_json(event)
-
-    async def countdown(self, event):
-        logger.debug(f"[COUNTDOWN] Forwarding to room {self.room_id}: {event}")
-        await self.send_json(event)
-
-    async def battle_started(self, event):
-        logger.debug(f"[BATTLE_STARTED] Forwarding to room {self.room_id}: {event}")
-        await self.send_json(event)
-
-    async def kicked(self, event):
-        await self.send_json(event)
-
-    async def room_closed(self, event):
-        await self.send_json(event)
-
-    async def participant_left(self, event):
-        await self.send_json(event)
\ No newline at end of file
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from room.services.matchmaking_service import run_matchmaking_pass
+
+
+class Command(BaseCommand):
+    help = "Form rated matches from the matchmaking queues."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0.5,
+            help="Seconds between two matcher passes."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        self.stdout.write(self.style.SUCCESS("[MATCHMAKER] Worker started"))
+        while True:
+            created = run_matchmaking_pass()
+            if any(created.values()):
+                summary = ', '.join(f"{mode}: {count}" for mode, count in created.items() if count)
+                self.stdout.write(f"[MATCHMAKER] Rooms created ({summary})")
+            time.sleep(interval)
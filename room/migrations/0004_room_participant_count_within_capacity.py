@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-19 14:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def clamp_participant_counts(apps, schema_editor):
+    Room = apps.get_model('room', 'Room')
+    Room.objects.filter(participant_count__gt=F('capacity')).update(participant_count=F('capacity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('room', '0003_alter_chatmessage_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_participant_counts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='room',
+            constraint=models.CheckConstraint(
+                check=models.Q(participant_count__lte=models.F('capacity')),
+                name='room_participant_count_within_capacity',
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('room', '0004_room_participant_count_within_capacity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_active', 'status', 'created_at'], name='room_room_is_acti_a48e77_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('room', '0006_chatmessage_stream_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_active', '-created_at', '-room_id'], name='room_room_is_acti_ba11d2_idx'),
+        ),
+    ]
@@ -3,13 +3,12 @@ from django.conf import settings
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync, sync_to_async
 import uuid
 import random
 import string
-import json
 from problems.models import Question
+from room.utils.broadcast import broadcast_sync
 
 def generate_join_code():
     characters = string.ascii_uppercase + string.digits
@@ -18,6 +17,36 @@ def generate_join_code():
         if not Room.objects.filter(join_code=code).exists():
             return code
 
+class RoomQuerySet(models.QuerySet):
+    """Targeted writes; update() skips the post_save room-list broadcast."""
+
+    def set_status(self, status, **fields):
+        return self.update(status=status, updated_at=timezone.now(), **fields)
+
+    def take_seat(self):
+        """Count one more joined participant unless the room is already full."""
+        return self.filter(participant_count__lt=models.F('capacity')).update(
+            participant_count=models.F('participant_count') + 1
+        )
+
+    def release_seat(self):
+        return self.filter(participant_count__gt=0).update(
+            participant_count=models.F('participant_count') - 1
+        )
+
+
+class RoomParticipantQuerySet(models.QuerySet):
+
+    def set_ready(self, ready):
+        return self.update(ready=ready, ready_at=timezone.now() if ready else None)
+
+    def in_battle(self):
+        """Participants still in the room when its battle started; lobby leavers keep their rows."""
+        return self.exclude(status='kicked').filter(
+            models.Q(left_at__isnull=True) | models.Q(left_at__gte=models.F('room__start_time'))
+        )
+
+
 class Room(models.Model):
     ROOM_VISIBILITY_CHOICES = (
         ('public', 'Public'),
@@ -57,12 +86,23 @@ class Room(models.Model):
     start_time = models.DateTimeField(null=True, blank=True, help_text="Time when the battle started")
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RoomQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=['join_code']),
             models.Index(fields=['owner']),
             models.Index(fields=['visibility']),
             models.Index(fields=['status']),
+            # Directory pages: the default listing, and the one filtered by status
+            models.Index(fields=['is_active', '-created_at', '-room_id']),
+            models.Index(fields=['is_active', 'status', 'created_at']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(participant_count__lte=models.F('capacity')),
+                name='room_participant_count_within_capacity',
+            ),
         ]
         ordering = ['-created_at']
 
@@ -109,7 +149,7 @@ class RoomParticipant(models.Model):
     left_at = models.DateTimeField(null=True, blank=True)
     blocked = models.BooleanField(default=False)
 
-
+    objects = RoomParticipantQuerySet.as_manager()
 
     class Meta:
         unique_together = ('room', 'user')
@@ -130,37 +170,43 @@ class RoomParticipant(models.Model):
 
 @sync_to_async
 def get_room_list():
-    rooms = Room.objects.filter(is_active=True).values(
-        'room_id', 'name', 'owner__username', 'topic', 'difficulty',
-        'time_limit', 'capacity', 'participant_count', 'visibility', 'status'
-    )
-    return [
-        {**room, 'room_id': str(room['room_id'])} for room in rooms
-    ]
+    from room.services.directory_service import room_page
+
+    return room_page(fresh=True)['rooms']
+
+# Room columns shown in the public list. Partial saves that touch none of them
+# (and any partial participant save) do not re-broadcast the list.
+ROOM_LIST_FIELDS = frozenset({
+    'name', 'topic', 'difficulty', 'time_limit', 'capacity', 'participant_count',
+    'visibility', 'status', 'is_active', 'is_ranked',
+})
 
 @receiver(post_save, sender=Room)
 @receiver(post_save, sender=RoomParticipant)
-def broadcast_room_update(sender, instance, **kwargs):
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        'rooms',
-        {
-            'type': 'room_update',
-            'rooms': async_to_sync(get_room_list)() 
-        }
-    )
+def broadcast_room_update(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and (sender is RoomParticipant or not ROOM_LIST_FIELDS & update_fields):
+        return
+    broadcast_sync('rooms', {
+        'type': 'room_update',
+        'rooms': async_to_sync(get_room_list)()
+    })
 
 
 class ChatMessage(models.Model):
     room_id = models.CharField(max_length=50)
     sender = models.CharField(max_length=100)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     is_system = models.BooleanField(default=False)
+    # Redis stream entry ID the row was flushed from; makes a repeated flush a no-op
+    stream_id = models.CharField(max_length=32, null=True, blank=True)
 
 
     class Meta:
         indexes = [
             models.Index(fields=['room_id', 'timestamp']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['room_id', 'stream_id'], name='unique_chat_stream_entry'),
+        ]
         ordering = ['timestamp']
\ No newline at end of file
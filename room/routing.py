@@ -1,10 +1,12 @@
 from django.urls import re_path
 from room.consumers.room_list import RoomConsumer
 from room.consumers.room_lobby import RoomLobbyConsumer
+from room.consumers.matchmaking import MatchmakingConsumer
 
 websocket_urlpatterns = [
     re_path(r'^ws/rooms/$', RoomConsumer.as_asgi()),
     re_path(r'^ws/room/(?P<room_id>[^/]+)/?$', RoomLobbyConsumer.as_asgi()),
+    re_path(r'^ws/matchmaking/$', MatchmakingConsumer.as_asgi()),
 ]
 
 
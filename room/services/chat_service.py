@@ -1,18 +1,103 @@
+"""
+Lobby chat lives in one capped Redis stream per room. Appends are O(1), the
+stream never grows past CHAT_STREAM_MAXLEN entries and history is read
+straight from it. When CHAT_PERSIST_TO_DB is on (the default),
+`flush_chat_streams` copies new entries into ChatMessage in batches instead of
+one INSERT per line.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
-from room.models import ChatMessage
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
 
-@database_sync_to_async
+from room.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_LIMIT = 100
+CHAT_STREAM_TTL = 6 * 60 * 60
+CHAT_FLUSH_BATCH = 500
+
+DIRTY_ROOMS_KEY = 'chat:dirty'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+FLUSH_CURSORS_KEY = 'chat:flushed'
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def chat_stream_key(room_id):
+    return f'chat:{room_id}'
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _entry_to_message(entry_id, fields):
+    fields = {_text(key): _text(value) for key, value in fields.items()}
+    return {
+        'id': _text(entry_id),
+        'message': fields.get('message', ''),
+        'sender': fields.get('sender', ''),
+        'timestamp': fields.get('timestamp'),
+        'is_system': fields.get('is_system') == '1',
+    }
+
+
+def _after(entry_id):
+    """Smallest stream ID strictly greater than `entry_id`."""
+    millis, seq = _text(entry_id).split('-')
+    return f'{millis}-{int(seq) + 1}'
+
+
+def append_chat_message(room_id, message, sender, is_system=False):
+    """Append one chat line to the room stream and return it."""
+    key = chat_stream_key(room_id)
+    fields = {
+        'message': message,
+        'sender': sender,
+        'timestamp': timezone.now().isoformat(),
+        'is_system': '1' if is_system else '0',
+    }
+    pipe = _redis().pipeline()
+    pipe.xadd(key, fields, maxlen=settings.CHAT_STREAM_MAXLEN, approximate=True)
+    pipe.expire(key, CHAT_STREAM_TTL)
+    if settings.CHAT_PERSIST_TO_DB:
+        pipe.sadd(DIRTY_ROOMS_KEY, str(room_id))
+    entry_id = pipe.execute()[0]
+    return _entry_to_message(entry_id, fields)
+
+
+def delete_chat_streams(room_ids):
+    """Drop the rooms' streams and their flush bookkeeping in one round trip."""
+    room_ids = [str(room_id) for room_id in room_ids]
+    if not room_ids:
+        return
+    pipe = _redis().pipeline()
+    pipe.delete(*[chat_stream_key(room_id) for room_id in room_ids])
+    pipe.hdel(FLUSH_CURSORS_KEY, *room_ids)
+    pipe.srem(DIRTY_ROOMS_KEY, *room_ids)
+    pipe.execute()
+
+
+def delete_chat_stream(room_id):
+    delete_chat_streams([room_id])
+
+
+@sync_to_async
 def save_chat_message(room_id, message, sender, is_system=False):
-    """Save a chat message to the database."""
+    """Append a chat message to the room stream."""
     try:
-        chat_message = ChatMessage.objects.create(
-            room_id=room_id,
-            sender=sender,
-            message=message,
-            is_system=is_system
-        )
-        return chat_message
+        return append_chat_message(room_id, message, sender, is_system)
     except Exception as e:
         print(f"[ERROR] Failed to save chat message: {str(e)}")
         return None
@@ -21,24 +106,139 @@ def save_chat_message(room_id, message, sender, is_system=False):
 def clear_chat_messages(room_id):
     """Clear all chat messages for a room."""
     try:
+        delete_chat_stream(room_id)
         ChatMessage.objects.filter(room_id=room_id).delete()
     except Exception as e:
         print(f"[ERROR] Failed to clear chat messages: {str(e)}")
 
+def _before(entry_id):
+    """Largest stream ID strictly smaller than `entry_id`."""
+    millis, seq = (int(part) for part in _text(entry_id).split('-'))
+    if seq > 0:
+        return f'{millis}-{seq - 1}'
+    return f'{millis - 1}-{2 ** 64 - 1}' if millis > 0 else None
+
+
+def _db_cursor(timestamp, pk=None):
+    """Keyset cursor into ChatMessage: epoch microseconds, plus the row id on ties."""
+    micros = (timestamp - EPOCH) // timedelta(microseconds=1)
+    return f'db:{micros}|{pk}' if pk is not None else f'db:{micros}'
+
+
+def _parse_db_cursor(cursor):
+    micros, _, pk = cursor[len('db:'):].partition('|')
+    timestamp = EPOCH + timedelta(microseconds=int(micros))
+    return timestamp, int(pk) if pk else None
+
+
+def _stream_id_time(entry_id):
+    millis = int(_text(entry_id).split('-')[0])
+    return datetime.fromtimestamp(millis / 1000, tz=dt_timezone.utc)
+
+
+def _row_to_message(row):
+    return {
+        'id': str(row.pk),
+        'message': row.message,
+        'sender': row.sender,
+        'timestamp': row.timestamp.isoformat(),
+        'is_system': row.is_system,
+    }
+
+
+def get_chat_page(room_id, before=None, limit=CHAT_HISTORY_LIMIT):
+    """
+    Return the newest `limit` messages older than the `before` cursor.
+
+    Recent messages come from the room stream; once it is exhausted the page
+    continues from ChatMessage with a (timestamp, id) keyset on the
+    (room_id, timestamp) index, so cost is bounded by `limit` however long the
+    room history is. Messages are returned oldest first, with the cursor for
+    the next (older) page.
+    """
+    limit = max(1, min(int(limit), CHAT_HISTORY_LIMIT))
+    page = []
+    next_cursor = None
+    older_than = None
+
+    if not (before and before.startswith('db:')):
+        stream_max = _before(before) if before else '+'
+        entries = []
+        if stream_max is not None:
+            entries = _redis().xrevrange(chat_stream_key(room_id), max=stream_max, min='-', count=limit + 1)
+        page = [_entry_to_message(entry_id, fields) for entry_id, fields in entries[:limit]]
+        if len(entries) > limit:
+            return {'messages': page[::-1], 'next_cursor': page[-1]['id'], 'has_more': True}
+        if page:
+            older_than = (parse_datetime(page[-1]['timestamp']), None)
+            # The stream is exhausted, so the next page continues in Postgres.
+            next_cursor = _db_cursor(older_than[0])
+        elif before:
+            # The cursor entry was trimmed from the stream in the meantime.
+            older_than = (_stream_id_time(before), None)
+    else:
+        older_than = _parse_db_cursor(before)
+
+    remaining = limit - len(page)
+    rows = ChatMessage.objects.filter(room_id=room_id)
+    if older_than:
+        timestamp, pk = older_than
+        keyset = Q(timestamp__lt=timestamp)
+        if pk is not None:
+            keyset |= Q(timestamp=timestamp, pk__lt=pk)
+        rows = rows.filter(keyset)
+    rows = list(rows.order_by('-timestamp', '-pk')[:remaining + 1])
+
+    page.extend(_row_to_message(row) for row in rows[:remaining])
+    if remaining and len(rows) >= remaining:
+        next_cursor = _db_cursor(rows[remaining - 1].timestamp, rows[remaining - 1].pk)
+    has_more = len(rows) > remaining
+    return {'messages': page[::-1], 'next_cursor': next_cursor if has_more else None, 'has_more': has_more}
+
+
 @database_sync_to_async
-def get_chat_history(room_id):
-    """Retrieve the chat history for a room."""
+def get_chat_history(room_id, before=None, limit=CHAT_HISTORY_LIMIT):
+    """Retrieve one page of chat history for a room, newest window first."""
     try:
-        messages = ChatMessage.objects.filter(room_id=room_id).order_by('timestamp')[:100]
-        return [
-            {
-                'message': msg.message,
-                'sender': msg.sender,
-                'timestamp': msg.timestamp.isoformat(),  
-
-                'is_system': msg.is_system
-            } for msg in messages
-        ]
+        return get_chat_page(room_id, before=before, limit=limit)
     except Exception as e:
         print(f"[ERROR] Failed to fetch chat history: {str(e)}")
-        return []
\ No newline at end of file
+        return {'messages': [], 'next_cursor': None, 'has_more': False}
+
+
+def flush_chat_streams():
+    """Persist stream entries appended since the last flush. Returns the row count."""
+    conn = _redis()
+    flushed = 0
+    for member in conn.smembers(DIRTY_ROOMS_KEY):
+        room_id = _text(member)
+        # Clear the flag first; a concurrent append simply marks the room again.
+        conn.srem(DIRTY_ROOMS_KEY, room_id)
+        try:
+            cursor = conn.hget(FLUSH_CURSORS_KEY, room_id)
+            start = _after(cursor) if cursor else '-'
+            while True:
+                entries = conn.xrange(chat_stream_key(room_id), min=start, count=CHAT_FLUSH_BATCH)
+                if not entries:
+                    break
+                messages = [_entry_to_message(entry_id, fields) for entry_id, fields in entries]
+                # Keyed by stream entry, so a batch re-read after a crash
+                # between the INSERT and the cursor update is skipped
+                ChatMessage.objects.bulk_create([
+                    ChatMessage(
+                        room_id=room_id,
+                        stream_id=msg['id'],
+                        sender=msg['sender'],
+                        message=msg['message'],
+                        is_system=msg['is_system'],
+                        timestamp=parse_datetime(msg['timestamp']) if msg['timestamp'] else timezone.now(),
+                    ) for msg in messages
+                ], ignore_conflicts=True)
+                last_id = messages[-1]['id']
+                conn.hset(FLUSH_CURSORS_KEY, room_id, last_id)
+                flushed += len(messages)
+                start = _after(last_id)
+        except Exception as e:
+            conn.sadd(DIRTY_ROOMS_KEY, room_id)
+            logger.error(f"[CHAT_FLUSH] Failed to flush chat for room {room_id}: {str(e)}")
+    return flushed
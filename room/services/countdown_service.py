@@ -0,0 +1,145 @@
+"""
+Lobby countdowns.
+
+A countdown is one `countdown` frame carrying the start timestamp, which
+clients render locally, and a pending `battle_started` frame for that moment.
+The pending start lives in Redis rather than in the process that accepted the
+request: a key per room holds the frame (set NX, so a room runs one countdown
+at a time) and a shared sorted set scored by start time is drained by the
+deadline worker, the same way battle deadlines are. Restarting a Daphne
+process loses nothing, and any node can see or cancel a countdown.
+"""
+
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django_redis import get_redis_connection
+
+from room.utils.broadcast import broadcast, broadcast_sync
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNTDOWN = 5
+MIN_COUNTDOWN = 3
+MAX_COUNTDOWN = 10
+
+STARTS_KEY = 'room:starts'
+# A pending start outlives its start time by this much if no worker fires it
+START_GRACE_MS = 30000
+# Seconds before a start whose broadcast failed is claimed again
+RETRY_DELAY = 1
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def _start_key(room_id):
+    return f'room:start:{room_id}'
+
+
+def clamp_countdown(value):
+    """Coerce a client supplied countdown into the allowed range."""
+    try:
+        seconds = int(value)
+    except (TypeError, ValueError):
+        seconds = DEFAULT_COUNTDOWN
+    return max(MIN_COUNTDOWN, min(seconds, MAX_COUNTDOWN))
+
+
+def _countdown_pending(room_id):
+    return bool(_redis().exists(_start_key(room_id)))
+
+
+def _reserve_start(room_id, starts_at, event, ttl_ms):
+    """Store the pending start unless the room already has one."""
+    conn = _redis()
+    if not conn.set(_start_key(room_id), json.dumps(event), nx=True, px=ttl_ms):
+        return False
+    conn.zadd(STARTS_KEY, {room_id: starts_at})
+    return True
+
+
+def _cancel_start(room_id):
+    pipe = _redis().pipeline()
+    pipe.delete(_start_key(room_id))
+    pipe.zrem(STARTS_KEY, str(room_id))
+    return bool(pipe.execute()[0])
+
+
+is_countdown_pending = sync_to_async(_countdown_pending)
+cancel_battle_start = sync_to_async(_cancel_start)
+
+
+async def schedule_battle_start(room, countdown=DEFAULT_COUNTDOWN):
+    """
+    Broadcast one `countdown` frame carrying the start timestamp and schedule
+    `battle_started` for that moment. Clients render the countdown locally.
+
+    Returns the start time as epoch milliseconds, or None if a countdown is
+    already running for the room.
+    """
+    room_id = str(room.room_id)
+    seconds = clamp_countdown(countdown)
+    now = time.time()
+    event = {
+        'type': 'battle_started',
+        'room_id': room_id,
+        'question': {
+            'id': room.active_question.id,
+        }
+    }
+    reserved = await sync_to_async(_reserve_start)(room_id, now + seconds, event, seconds * 1000 + START_GRACE_MS)
+    if not reserved:
+        return None
+
+    starts_at = int((now + seconds) * 1000)
+    await broadcast(f'room_{room_id}', {
+        'type': 'countdown',
+        'countdown': seconds,
+        'starts_at': starts_at,
+        'server_time': int(now * 1000),
+        'is_ranked': room.is_ranked,
+    })
+    return starts_at
+
+
+def next_start():
+    """Epoch time of the earliest pending start, or None."""
+    head = _redis().zrange(STARTS_KEY, 0, 0, withscores=True)
+    return head[0][1] if head else None
+
+
+def claim_due_starts(now=None, limit=100):
+    """Pop the rooms whose countdown has run out; each goes to exactly one caller."""
+    now = time.time() if now is None else now
+    conn = _redis()
+    claimed = []
+    for member in conn.zrangebyscore(STARTS_KEY, '-inf', now, start=0, num=limit):
+        if conn.zrem(STARTS_KEY, member):
+            claimed.append(member.decode() if isinstance(member, bytes) else member)
+    return claimed
+
+
+def fire_due_starts(now=None):
+    """Broadcast `battle_started` for every countdown that has run out. Returns the count."""
+    conn = _redis()
+    fired = 0
+    for room_id in claim_due_starts(now):
+        raw = conn.get(_start_key(room_id))
+        if raw is None:
+            # Cancelled after it was claimed
+            continue
+        event = json.loads(raw)
+        try:
+            broadcast_sync(f'room_{room_id}', event)
+        except Exception as e:
+            logger.error(f"[COUNTDOWN] Failed to start battle in room {room_id}, retrying: {str(e)}")
+            conn.zadd(STARTS_KEY, {room_id: time.time() + RETRY_DELAY}, nx=True)
+            continue
+        conn.delete(_start_key(room_id))
+        logger.info(f"[BATTLE_STARTED] Room {room_id} navigating to battle with question {event['question']['id']}")
+        fired += 1
+    return fired
@@ -0,0 +1,131 @@
+"""
+Public room directory.
+
+Rooms are listed newest first in keyset pages over (created_at, room_id), so
+a page costs the same however many rooms exist. The unfiltered listing walks
+the (is_active, -created_at, -room_id) index in page order, a status filter
+uses (is_active, status, created_at), and the other filters run in SQL on top
+of whichever applies. The first page of each filter set is
+what nearly every client asks for, so it is cached for FIRST_PAGE_TTL seconds
+and shared by everyone who opens the lobby browser in that window.
+
+`participant_count` is the number of players with a live connection, taken
+from the presence sets; `seats_taken` is Room.participant_count, the counter
+that admission reserves seats against, and what `has_space` filters on.
+"""
+
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from room.models import Room
+from room.services.presence_service import online_counts
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+FIRST_PAGE_TTL = 2
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+LIST_FIELDS = (
+    'room_id', 'name', 'owner__username', 'topic', 'difficulty', 'time_limit', 'capacity',
+    'participant_count', 'visibility', 'status', 'join_code', 'is_ranked', 'created_at',
+)
+FILTERS = ('difficulty', 'topic', 'is_ranked', 'visibility', 'status', 'has_space')
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def clean_filters(params):
+    """Keep the supported filters from query params or a socket message."""
+    filters = {}
+    for name in FILTERS:
+        value = params.get(name)
+        if value in (None, ''):
+            continue
+        if name in ('is_ranked', 'has_space'):
+            filters[name] = _flag(value)
+        elif name in ('difficulty', 'topic'):
+            filters[name] = str(value).upper()
+        else:
+            filters[name] = str(value)
+    return filters
+
+
+def _encode_cursor(created_at, room_id):
+    micros = (created_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}|{room_id}'
+
+
+def _decode_cursor(cursor):
+    micros, _, room_id = cursor.partition('|')
+    return EPOCH + timedelta(microseconds=int(micros)), uuid.UUID(room_id)
+
+
+def _queryset(filters):
+    rooms = Room.objects.filter(is_active=True)
+    if 'status' in filters:
+        rooms = rooms.filter(status=filters['status'])
+    for name in ('difficulty', 'topic', 'is_ranked', 'visibility'):
+        if name in filters:
+            rooms = rooms.filter(**{name: filters[name]})
+    if filters.get('has_space'):
+        rooms = rooms.filter(participant_count__lt=F('capacity'))
+    return rooms
+
+
+def _fetch_page(filters, cursor, limit):
+    rooms = _queryset(filters)
+    if cursor:
+        created_at, room_id = _decode_cursor(cursor)
+        rooms = rooms.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, room_id__lt=room_id))
+    rows = list(rooms.order_by('-created_at', '-room_id').values(*LIST_FIELDS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1]['created_at'], rows[-1]['room_id']) if has_more else None
+    online = online_counts(row['room_id'] for row in rows)
+    return {
+        'rooms': [
+            {
+                **row,
+                'room_id': str(row['room_id']),
+                'created_at': row['created_at'].isoformat(),
+                # Shown occupancy is live presence; the seat counter only gates admission
+                'participant_count': online.get(str(row['room_id']), 0),
+                'seats_taken': row['participant_count'],
+            }
+            for row in rows
+        ],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+
+def _first_page_key(filters, limit):
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f'rooms:first-page:{limit}:{digest}'
+
+
+def room_page(filters=None, cursor=None, limit=PAGE_SIZE, fresh=False):
+    """
+    One page of the directory: {'rooms', 'next_cursor', 'has_more'}.
+    `fresh` skips the cached first page and replaces it; broadcasts that follow
+    a change use it. Raises ValueError for a malformed cursor or limit.
+    """
+    filters = filters or {}
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if cursor:
+        return _fetch_page(filters, cursor, limit)
+    key = _first_page_key(filters, limit)
+    page = None if fresh else cache.get(key)
+    if page is None:
+        page = _fetch_page(filters, None, limit)
+        cache.set(key, page, FIRST_PAGE_TTL)
+    return page
@@ -0,0 +1,168 @@
+"""
+Coalesced lobby broadcasts.
+
+Joins, leaves, kicks and ready toggles used to fan out a frame each, and every
+one of them re-read the participant list. Instead each change is appended to a
+per-room event list in Redis and the first change inside a COALESCE_WINDOW tick
+claims the flush with SET NX PX. The claiming worker reads the room once after
+the window and broadcasts a single `lobby_state` frame carrying the full
+participant list plus the events that produced it. Changes raised on other
+workers during the same tick land in the same frame because the event list and
+the tick key are shared.
+"""
+
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django_redis import get_redis_connection
+
+from room.models import Room
+from room.services.participant_service import _participant_rows
+from room.services.room_service import get_room_list
+from room.utils.broadcast import ROOMS_GROUP, broadcast, broadcast_sync
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW = 0.05
+# The tick key outlives the window so a worker that dies before flushing only
+# delays the room until the next change, instead of wedging it.
+TICK_TTL_MS = 1000
+EVENTS_TTL = 60
+ROOM_LIST_TICK_KEY = 'lobby:tick:rooms'
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def _tick_key(room_id):
+    return f'lobby:tick:{room_id}'
+
+
+def _events_key(room_id):
+    return f'lobby:events:{room_id}'
+
+
+def _claim_lobby_tick(room_id, event=None):
+    """Record an event and return True if this call opened the tick."""
+    pipe = _redis().pipeline()
+    if event:
+        pipe.rpush(_events_key(room_id), json.dumps(event))
+        pipe.expire(_events_key(room_id), EVENTS_TTL)
+    pipe.set(_tick_key(room_id), 1, nx=True, px=TICK_TTL_MS)
+    return bool(pipe.execute()[-1])
+
+
+def _take_lobby_events(room_id):
+    """Pop the events of the current tick and reopen it for later changes."""
+    pipe = _redis().pipeline()
+    pipe.lrange(_events_key(room_id), 0, -1)
+    pipe.delete(_events_key(room_id))
+    pipe.delete(_tick_key(room_id))
+    raw_events = pipe.execute()[0]
+    return [json.loads(raw) for raw in raw_events]
+
+
+def _claim_room_list_tick():
+    return bool(_redis().set(ROOM_LIST_TICK_KEY, 1, nx=True, px=TICK_TTL_MS))
+
+
+def _release_room_list_tick():
+    _redis().delete(ROOM_LIST_TICK_KEY)
+
+
+def _lobby_state(room_id):
+    """Room summary and participant list for a `lobby_state` frame."""
+    room = Room.objects.filter(room_id=room_id).values(
+        'is_ranked', 'capacity', 'participant_count', 'status'
+    ).first()
+    if room is None:
+        return None
+    participants = _participant_rows(room_id)
+    return {
+        'type': 'lobby_state',
+        'room_id': str(room_id),
+        'participants': participants,
+        **room,
+        # Live occupancy from presence; the seat counter stays available as seats_taken
+        'participant_count': sum(1 for row in participants if row['online']),
+        'seats_taken': room['participant_count'],
+    }
+
+
+get_lobby_state = database_sync_to_async(_lobby_state)
+
+
+def _spawn(coro_factory, *args):
+    asyncio.ensure_future(coro_factory(*args))
+
+
+async def queue_lobby_state(room_id, event=None):
+    """Schedule a `lobby_state` broadcast for the room, merging `event` into it."""
+    room_id = str(room_id)
+    try:
+        claimed = await sync_to_async(_claim_lobby_tick)(room_id, event)
+    except Exception as e:
+        logger.error(f"[ERROR] Error queueing lobby state for room {room_id}: {str(e)}")
+        return
+    if claimed:
+        asyncio.get_running_loop().call_later(COALESCE_WINDOW, _spawn, flush_lobby_state, room_id)
+
+
+async def flush_lobby_state(room_id):
+    """Broadcast one consolidated frame for everything queued during the tick."""
+    try:
+        events = await sync_to_async(_take_lobby_events)(room_id)
+        state = await get_lobby_state(room_id)
+        if state is None:
+            return
+        state['events'] = events
+        await broadcast(f'room_{room_id}', state)
+    except Exception as e:
+        logger.error(f"[ERROR] Error flushing lobby state for room {room_id}: {str(e)}")
+
+
+def publish_lobby_state(room_id, event=None):
+    """
+    Synchronous counterpart of queue_lobby_state for views. There is no loop
+    to wait on, so a caller that opens the tick flushes straight away; if a
+    tick is already open the event rides along with that flush.
+    """
+    room_id = str(room_id)
+    try:
+        if not _claim_lobby_tick(room_id, event):
+            return
+        events = _take_lobby_events(room_id)
+        state = _lobby_state(room_id)
+        if state is None:
+            return
+        state['events'] = events
+        broadcast_sync(f'room_{room_id}', state)
+    except Exception as e:
+        logger.error(f"[ERROR] Error publishing lobby state for room {room_id}: {str(e)}")
+
+
+async def queue_room_list_refresh():
+    """Schedule one `room_update` for the public room list per tick."""
+    try:
+        claimed = await sync_to_async(_claim_room_list_tick)()
+    except Exception as e:
+        logger.error(f"[ERROR] Error queueing room list refresh: {str(e)}")
+        return
+    if claimed:
+        asyncio.get_running_loop().call_later(COALESCE_WINDOW, _spawn, flush_room_list)
+
+
+async def flush_room_list():
+    try:
+        await sync_to_async(_release_room_list_tick)()
+        rooms = await get_room_list()
+        await broadcast(ROOMS_GROUP, {
+            'type': 'room_update',
+            'rooms': rooms,
+        })
+    except Exception as e:
+        logger.error(f"[ERROR] Error triggering room update: {str(e)}")
@@ -0,0 +1,292 @@
+"""
+Rating-aware matchmaking.
+
+Each mode has two sorted sets over the same members (user ids): one scored
+by rating, which answers "who is within N points of this player" with a
+ZRANGEBYSCORE in O(log n + m), and one scored by enqueue time, which lets
+the matcher serve the longest waiters first and widen their rating window
+as they wait. A Lua script removes a whole group from the queue only if
+every member is still queued, so two matcher processes can never place the
+same player twice. Queued sockets refresh a heartbeat in a third set scored
+by expiry; players whose socket died without dequeuing them expire after
+QUEUE_TTL seconds and are pruned before each pass, so nobody is matched
+while offline or left stuck as "already queued".
+"""
+
+import logging
+import random
+import secrets
+import time
+
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from rankings.models import Ranking
+from room.models import Room, RoomParticipant
+from room.utils.broadcast import push_to_matchmaking
+from room.utils.battle import playable_questions
+
+logger = logging.getLogger(__name__)
+
+MODES = {'1v1': 2, 'squad': 5, 'team': 10}
+DEFAULT_RATING = 1200
+BASE_WINDOW = 50
+WIDEN_PER_SECOND = 10
+MAX_WINDOW = 600
+# Longest waiters considered per mode and tick; bounds the work of one pass
+ANCHORS_PER_TICK = 200
+MATCH_TIME_LIMIT = 20
+MATCH_TTL = 120
+# Seconds a queued player stays queued without a heartbeat
+QUEUE_TTL = 45
+
+CLAIM_GROUP = """
+for _, member in ipairs(ARGV) do
+    if not redis.call('ZSCORE', KEYS[1], member) then
+        return 0
+    end
+end
+for _, member in ipairs(ARGV) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZREM', KEYS[3], member)
+end
+return 1
+"""
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def queue_key(mode):
+    return f'mm:queue:{mode}'
+
+
+def waiting_key(mode):
+    return f'mm:waiting:{mode}'
+
+
+def alive_key(mode):
+    return f'mm:alive:{mode}'
+
+
+def player_key(user_id):
+    return f'mm:player:{user_id}'
+
+
+def match_key(user_id):
+    return f'mm:match:{user_id}'
+
+
+def current_rating(user_id):
+    rating = Ranking.objects.filter(season__is_active=True, user_id=user_id).values_list('rating', flat=True).first()
+    return DEFAULT_RATING if rating is None else rating
+
+
+def enqueue(user_id, mode):
+    """Queue a player for `mode`; returns False if they are already queued."""
+    conn = _redis()
+    if not conn.set(player_key(user_id), mode, nx=True, ex=QUEUE_TTL):
+        return False
+    conn.delete(match_key(user_id))
+    now = time.time()
+    pipe = conn.pipeline()
+    pipe.zadd(queue_key(mode), {user_id: current_rating(user_id)})
+    pipe.zadd(waiting_key(mode), {user_id: now})
+    pipe.zadd(alive_key(mode), {user_id: now + QUEUE_TTL})
+    pipe.execute()
+    return True
+
+
+def refresh_queue(user_id):
+    """Heartbeat from a queued socket; keeps the player queued for another QUEUE_TTL."""
+    conn = _redis()
+    mode = conn.get(player_key(user_id))
+    if mode is None:
+        return False
+    pipe = conn.pipeline()
+    pipe.expire(player_key(user_id), QUEUE_TTL)
+    pipe.zadd(alive_key(mode.decode()), {user_id: time.time() + QUEUE_TTL}, xx=True)
+    pipe.execute()
+    return True
+
+
+def prune_expired(mode, now=None):
+    """Drop players whose heartbeat stopped; returns how many were removed."""
+    now = now or time.time()
+    conn = _redis()
+    expired = conn.zrangebyscore(alive_key(mode), '-inf', now)
+    if expired:
+        pipe = conn.pipeline()
+        pipe.zrem(queue_key(mode), *expired)
+        pipe.zrem(waiting_key(mode), *expired)
+        pipe.zrem(alive_key(mode), *expired)
+        pipe.execute()
+    return len(expired)
+
+
+def dequeue(user_id):
+    conn = _redis()
+    mode = conn.get(player_key(user_id))
+    if mode is None:
+        return False
+    mode = mode.decode()
+    pipe = conn.pipeline()
+    pipe.zrem(queue_key(mode), user_id)
+    pipe.zrem(waiting_key(mode), user_id)
+    pipe.zrem(alive_key(mode), user_id)
+    pipe.delete(player_key(user_id))
+    pipe.execute()
+    return True
+
+
+def queue_status(user_id):
+    """{'state': 'matched'|'queued'|'idle', ...} for polling clients."""
+    conn = _redis()
+    room_id = conn.get(match_key(user_id))
+    if room_id is not None:
+        return {'state': 'matched', 'room_id': room_id.decode()}
+    mode = conn.get(player_key(user_id))
+    if mode is None:
+        return {'state': 'idle'}
+    mode = mode.decode()
+    since = conn.zscore(waiting_key(mode), user_id)
+    return {
+        'state': 'queued',
+        'mode': mode,
+        'waited': round(time.time() - since, 1) if since else 0,
+        'queued_players': conn.zcard(queue_key(mode)),
+    }
+
+
+def rating_window(waited):
+    return min(BASE_WINDOW + WIDEN_PER_SECOND * waited, MAX_WINDOW)
+
+
+def _pick_group(conn, mode, anchor, now, waited_since):
+    """{member: rating} for the anchor and the closest-rated players in its window."""
+    capacity = MODES[mode]
+    rating = conn.zscore(queue_key(mode), anchor)
+    if rating is None:
+        return None
+    window = rating_window(now - waited_since)
+    # Twice the capacity on each side is plenty to choose the closest from
+    below = conn.zrevrangebyscore(queue_key(mode), rating, rating - window, start=0, num=capacity * 2, withscores=True)
+    above = conn.zrangebyscore(queue_key(mode), rating, rating + window, start=0, num=capacity * 2, withscores=True)
+    candidates = {member: score for member, score in below + above if member != anchor}
+    if len(candidates) < capacity - 1:
+        return None
+    closest = sorted(candidates, key=lambda member: abs(candidates[member] - rating))[:capacity - 1]
+    return {anchor: rating, **{member: candidates[member] for member in closest}}
+
+
+def _difficulty_for(ratings):
+    average = sum(ratings) / len(ratings)
+    if average < 1300:
+        return 'EASY'
+    if average < 1600:
+        return 'MEDIUM'
+    return 'HARD'
+
+
+def _pick_topic(difficulty):
+    """
+    A (topic, difficulty) pair that has playable questions, preferring the
+    requested difficulty, so the room can always be started.
+    """
+    pairs = list(playable_questions().order_by().values_list('tags', 'difficulty').distinct())
+    if not pairs:
+        raise ValueError("No playable questions")
+    return random.choice([pair for pair in pairs if pair[1] == difficulty] or pairs)
+
+
+def create_match_room(mode, user_ids, ratings):
+    """One Room and all of its participants, created in bulk in one transaction."""
+    capacity = MODES[mode]
+    topic, difficulty = _pick_topic(_difficulty_for(ratings))
+    with transaction.atomic():
+        room = Room.objects.create(
+            name=f"Ranked {mode}",
+            owner_id=user_ids[0],
+            topic=topic,
+            difficulty=difficulty,
+            time_limit=MATCH_TIME_LIMIT,
+            capacity=capacity,
+            participant_count=len(user_ids),
+            visibility='private',
+            password=secrets.token_urlsafe(12),
+            is_ranked=True,
+        )
+        RoomParticipant.objects.bulk_create([
+            RoomParticipant(
+                room=room,
+                user_id=user_id,
+                role='host' if index == 0 else 'participant',
+                status='joined',
+                ready=index != 0,
+            )
+            for index, user_id in enumerate(user_ids)
+        ])
+    return room
+
+
+def _announce(room, mode, user_ids):
+    conn = _redis()
+    pipe = conn.pipeline()
+    for user_id in user_ids:
+        pipe.set(match_key(user_id), str(room.room_id), ex=MATCH_TTL)
+        pipe.delete(player_key(user_id))
+    pipe.execute()
+    for user_id in user_ids:
+        push_to_matchmaking(user_id, {
+            'type': 'match_found',
+            'room_id': str(room.room_id),
+            'mode': mode,
+            'players': len(user_ids),
+        })
+
+
+def form_matches(mode, now=None):
+    """One matcher pass over the longest waiters of a mode; returns rooms created."""
+    now = now or time.time()
+    conn = _redis()
+    claim = conn.register_script(CLAIM_GROUP)
+    prune_expired(mode, now)
+    matched = set()
+    created = 0
+    for anchor, waited_since in conn.zrange(waiting_key(mode), 0, ANCHORS_PER_TICK - 1, withscores=True):
+        if anchor in matched:
+            continue
+        group = _pick_group(conn, mode, anchor, now, waited_since)
+        if not group or matched.intersection(group):
+            continue
+        members = list(group)
+        pipe = conn.pipeline()
+        for member in members:
+            pipe.zscore(waiting_key(mode), member)
+        waits = pipe.execute()
+        if not claim(keys=[queue_key(mode), waiting_key(mode), alive_key(mode)], args=members):
+            continue
+        matched.update(members)
+
+        user_ids = [int(member) for member in members]
+        try:
+            room = create_match_room(mode, user_ids, list(group.values()))
+        except Exception as e:
+            logger.error(f"[ERROR] Could not create {mode} match room: {str(e)}")
+            # Put the players back with their original wait times
+            pipe = conn.pipeline()
+            for member, wait in zip(members, waits):
+                pipe.zadd(queue_key(mode), {member: group[member]})
+                pipe.zadd(waiting_key(mode), {member: wait or now})
+                pipe.zadd(alive_key(mode), {member: now + QUEUE_TTL})
+            pipe.execute()
+            continue
+        _announce(room, mode, user_ids)
+        created += 1
+    return created
+
+
+def run_matchmaking_pass(now=None):
+    return {mode: form_matches(mode, now) for mode in MODES}
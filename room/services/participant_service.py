@@ -1,7 +1,21 @@
 from channels.db import database_sync_to_async
 from room.models import Room, RoomParticipant
+from room.services.presence_service import online_user_ids
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 
+
+def _participant_rows(room_id):
+    """Participant rows with a live `online` flag from the presence set."""
+    rows = list(RoomParticipant.objects.filter(room_id=room_id).values(
+        'user_id', 'user__username', 'role', 'status', 'ready'
+    ))
+    online = online_user_ids(room_id)
+    for row in rows:
+        row['online'] = row.pop('user_id') in online
+    return rows
+
 @database_sync_to_async
 def check_participant(user, room_id):
     """Check if a user is a participant in a room and not kicked."""
@@ -10,102 +24,109 @@ def check_participant(user, room_id):
         room_id=room_id
     ).exclude(status='kicked').exists()
 
+@database_sync_to_async
+def get_bound_participant(room_id, user):
+    """The user's participant row (with its room) if they may join the battle."""
+    try:
+        return RoomParticipant.objects.select_related('room').filter(
+            room_id=room_id, user=user, blocked=False
+        ).exclude(status='kicked').first()
+    except ValidationError:
+        return None
+
 @database_sync_to_async
 def get_participants(room_id):
 
-    return list(RoomParticipant.objects.filter(room_id=room_id).values(
-        'user__username', 'role', 'status', 'ready'
-    ))
+    return _participant_rows(room_id)
 
-@database_sync_to_async
-def ensure_participant(room_id, user, status):
+def take_seat(room_id):
+    return Room.objects.filter(room_id=room_id).take_seat() == 1
 
-    try:
-        room = Room.objects.get(room_id=room_id)
+def release_seat(room_id):
+    Room.objects.filter(room_id=room_id).release_seat()
+
+def admit_participant(room_id, user, role='participant'):
+    """
+    Move the user into the joined state, taking a seat only on the transition.
+
+    The seat is claimed with one conditional UPDATE, so concurrent joins cannot
+    overshoot capacity. Returns (participant, admitted); the participant is None
+    when the room is full or the user was kicked or blocked from it.
+    """
+    with transaction.atomic():
         participant, created = RoomParticipant.objects.get_or_create(
             room_id=room_id,
             user=user,
-            defaults={
-                'role': 'host' if room.owner == user else 'participant',
-                'status': status,
-                'joined_at': timezone.now(),
-                'ready': False,
-            }
+            defaults={'role': role, 'status': 'joined', 'ready': False},
         )
         if not created:
-            participant.status = status
-            participant.left_at = None if status == 'joined' else timezone.now()
-            participant.save()
+            rejoined = RoomParticipant.objects.filter(pk=participant.pk, blocked=False).exclude(
+                status__in=('joined', 'kicked')
+            ).update(status='joined', left_at=None)
+            if not rejoined:
+                participant.refresh_from_db(fields=['status', 'blocked'])
+                if participant.blocked or participant.status == 'kicked':
+                    return None, False
+                return participant, False
+            participant.status = 'joined'
+            participant.left_at = None
+        if not take_seat(room_id):
+            transaction.set_rollback(True)
+            return None, False
+        return participant, True
+
+def _leave(room_id, status, **lookup):
+    """Move a joined participant to `status`; True if this call made the transition."""
+    with transaction.atomic():
+        updated = RoomParticipant.objects.filter(
+            room_id=room_id, status='joined', **lookup
+        ).update(status=status, left_at=timezone.now())
+        if updated:
+            release_seat(room_id)
+        return bool(updated)
 
-        room.participant_count = RoomParticipant.objects.filter(
-            room_id=room_id, status='joined'
-        ).count()
-        room.save()
+@database_sync_to_async
+def ensure_participant(room_id, user, status):
 
-        return participant
-    except Room.DoesNotExist:
+    owner_id = Room.objects.filter(room_id=room_id).values_list('owner_id', flat=True).first()
+    if owner_id is None:
         print(f"[ERROR] Room {room_id} not found")
         return None
+    if status != 'joined':
+        _leave(room_id, status, user=user)
+        return RoomParticipant.objects.filter(room_id=room_id, user=user).first()
+
+    role = 'host' if owner_id == user.pk else 'participant'
+    participant, _ = admit_participant(room_id, user, role)
+    if participant is None:
+        print(f"[ERROR] Room {room_id} is full or {user} may not rejoin it")
+    return participant
 
 @database_sync_to_async
 def update_participant_status(room_id, user, status):
-
-    try:
-        participant = RoomParticipant.objects.get(room_id=room_id, user=user)
-        participant.status = status
-        participant.left_at = None if status == 'joined' else timezone.now()
-        participant.save()
-
-        room = Room.objects.get(room_id=room_id)
-        room.participant_count = RoomParticipant.objects.filter(
-            room_id=room_id, status='joined'
-        ).count()
-        room.save()
-
-        return list(RoomParticipant.objects.filter(room_id=room_id).values(
-            'user__username', 'role', 'status', 'ready'
-        ))
-    except RoomParticipant.DoesNotExist:
-        print(f"[ERROR] Participant {user} not found in room {room_id}")
-        return None
-    except Room.DoesNotExist:
-        print(f"[ERROR] Room {room_id} not found")
+    """Returns the new participant list, or None if nothing changed."""
+    if status == 'joined':
+        participant, admitted = admit_participant(room_id, user)
+        if not admitted:
+            return None
+    elif not _leave(room_id, status, user=user):
         return None
+    return _participant_rows(room_id)
 
 @database_sync_to_async
 def update_ready_status(room_id, user, ready):
 
-    try:
-        participant = RoomParticipant.objects.get(room_id=room_id, user=user)
-        participant.ready = ready
-        participant.ready_at = timezone.now() if ready else None
-        participant.save()
-    except RoomParticipant.DoesNotExist:
+    if not RoomParticipant.objects.filter(room_id=room_id, user=user).set_ready(ready):
         print(f"[ERROR] Participant {user} not found for ready status update")
 
 @database_sync_to_async
 def kick_participant(room_id, target_username):
-    try:
-        participant = RoomParticipant.objects.get(
-            room_id=room_id,
-            user__username=target_username,
-            status='joined'
-        )
-        participant.status = 'kicked'
-        participant.left_at = timezone.now()
-        participant.blocked = True
-        participant.save()
-
-        room = Room.objects.get(room_id=room_id)
-        room.participant_count = RoomParticipant.objects.filter(
-            room_id=room_id, status='joined'
-        ).count()
-        room.save()
-
+    with transaction.atomic():
+        kicked = RoomParticipant.objects.filter(
+            room_id=room_id, user__username=target_username, status='joined'
+        ).update(status='kicked', left_at=timezone.now(), blocked=True)
+        if not kicked:
+            print(f"[ERROR] Cannot kick {target_username}: Participant not found")
+            return False
+        release_seat(room_id)
         return True
-    except RoomParticipant.DoesNotExist:
-        print(f"[ERROR] Cannot kick {target_username}: Participant not found")
-        return False
-    except Room.DoesNotExist:
-        print(f"[ERROR] Room {room_id} not found")
-        return False
\ No newline at end of file
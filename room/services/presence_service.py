@@ -0,0 +1,68 @@
+"""
+Live presence shared by every ASGI worker.
+
+Each room has a sorted set whose members are `<user_id>:<channel_name>` (one
+per open connection) scored by the time the entry expires. Connections refresh
+their score with a heartbeat; a crashed worker simply stops refreshing and its
+entries fall out of every read after PRESENCE_TTL seconds, without waiting for
+a cleanup task to rewrite RoomParticipant rows.
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+def _redis():
+    return get_redis_connection('realtime')
+
+
+def presence_key(room_id):
+    return f'presence:{room_id}'
+
+
+def _member(user_id, channel_name):
+    return f'{user_id}:{channel_name}'
+
+
+def touch_presence(room_id, user_id, channel_name):
+    """Mark a connection alive for another PRESENCE_TTL seconds."""
+    now = time.time()
+    key = presence_key(room_id)
+    pipe = _redis().pipeline()
+    pipe.zadd(key, {_member(user_id, channel_name): now + settings.PRESENCE_TTL})
+    pipe.zremrangebyscore(key, '-inf', now)
+    pipe.expire(key, settings.PRESENCE_TTL * 2)
+    pipe.execute()
+
+
+def drop_presence(room_id, user_id, channel_name):
+    _redis().zrem(presence_key(room_id), _member(user_id, channel_name))
+
+
+def _user_ids(members):
+    return {int((m.decode() if isinstance(m, bytes) else m).split(':', 1)[0]) for m in members}
+
+
+def online_user_ids(room_id):
+    """Ids of users with at least one live connection to the room."""
+    members = _redis().zrangebyscore(presence_key(room_id), time.time(), '+inf')
+    return _user_ids(members)
+
+
+def online_counts(room_ids):
+    """Live user count per room, fetched for all rooms in one round trip."""
+    room_ids = [str(room_id) for room_id in room_ids]
+    if not room_ids:
+        return {}
+    now = time.time()
+    pipe = _redis().pipeline()
+    for room_id in room_ids:
+        pipe.zrangebyscore(presence_key(room_id), now, '+inf')
+    return {room_id: len(_user_ids(members)) for room_id, members in zip(room_ids, pipe.execute())}
+
+
+mark_online = sync_to_async(touch_presence)
+mark_offline = sync_to_async(drop_presence)
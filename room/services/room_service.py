@@ -1,7 +1,9 @@
 from channels.db import database_sync_to_async
 from room.models import Room, RoomParticipant
 from django.core.exceptions import ObjectDoesNotExist
+from battle.services.history_service import ARCHIVABLE_STATUSES
 from battle.tasks import cleanup_room_data
+from room.services.directory_service import PAGE_SIZE, room_page
 @database_sync_to_async
 def get_room(room_id):
 
@@ -12,36 +14,27 @@ def get_room(room_id):
 
 @database_sync_to_async
 def get_room_list():
-
+    """First page of the public directory, as pushed to every room-list socket."""
     try:
-        rooms = Room.objects.filter(is_active=True).prefetch_related('participants').values(
-            'room_id', 'name', 'owner__username', 'topic', 'difficulty',
-            'time_limit', 'capacity', 'participant_count', 'visibility', 'status', 'is_ranked', 'join_code'
-        )
-        processed_rooms = []
-        for room in rooms:
-            participants = list(RoomParticipant.objects.filter(room_id=room['room_id']).values(
-                'user__username', 'role', 'status', 'ready'
-            ))
-            processed_rooms.append({
-                **room,
-                'room_id': str(room['room_id']),
-                'participants': participants
-            })
-        return processed_rooms
+        return room_page(fresh=True)['rooms']
     except Exception as e:
         print(f"[ERROR] Failed to fetch room list: {str(e)}")
         return []
 
+@database_sync_to_async
+def get_room_page(filters=None, cursor=None, limit=PAGE_SIZE):
+    return room_page(filters, cursor, limit)
+
 @database_sync_to_async
 def close_room(room_id):
 
-    try:
-        room = Room.objects.get(room_id=room_id)
-        room.is_active = False
-        room.status = 'closed'
-        room.save()
-        cleanup_room_data.apply_async((room.room_id,), countdown=120)
-        return True
-    except Room.DoesNotExist:
-        return False
\ No newline at end of file
+    rooms = Room.objects.filter(room_id=room_id)
+    # A finished battle keeps its 'completed' status so cleanup archives it to match history
+    closed = (
+        rooms.exclude(status__in=ARCHIVABLE_STATUSES).set_status('closed', is_active=False)
+        or rooms.filter(status__in=ARCHIVABLE_STATUSES).update(is_active=False)
+    )
+    if not closed:
+        return False
+    cleanup_room_data.apply_async((str(room_id),), countdown=120)
+    return True
\ No newline at end of file
@@ -0,0 +1,13 @@
+from celery import shared_task
+from django.conf import settings
+
+from room.services.chat_service import flush_chat_streams
+
+
+@shared_task
+def flush_chat_history():
+    """Batch-persist lobby chat from the Redis streams into ChatMessage."""
+    if not settings.CHAT_PERSIST_TO_DB:
+        return '[CHAT-FLUSH] Persistence disabled.'
+    flushed = flush_chat_streams()
+    return f'[CHAT-FLUSH] {flushed} chat messages persisted.'
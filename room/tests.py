@@ -1,2 +1,159 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from unittest import mock
 
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from room.consumers.base_consumer import BaseConsumer
+from room.models import Room, RoomParticipant
+from room.services.directory_service import room_page
+from room.services.participant_service import admit_participant
+from room.utils.rate_limit import ConnectionRateLimiter
+
+LOCAL_CACHES = {
+    **settings.CACHES,
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+class RateLimiterTests(SimpleTestCase):
+
+    def test_configured_types_have_their_own_bucket(self):
+        limiter = ConnectionRateLimiter({'chat_message': (0, 2)}, (0, 1))
+
+        self.assertTrue(limiter.allow('chat_message'))
+        self.assertTrue(limiter.allow('chat_message'))
+        self.assertFalse(limiter.allow('chat_message'))
+        self.assertTrue(limiter.allow('ping'))
+
+    def test_unknown_types_share_the_default_bucket(self):
+        limiter = ConnectionRateLimiter({}, (0, 3))
+
+        allowed = [limiter.allow(f'made-up-{i}') for i in range(5)]
+
+        self.assertEqual(allowed, [True, True, True, False, False])
+        self.assertEqual(limiter.buckets, {})
+
+
+@mock.patch('room.consumers.base_consumer.send_error')
+class RateViolationTests(SimpleTestCase):
+
+    def _consumer(self):
+        with mock.patch('time.monotonic', return_value=100.0):
+            consumer = BaseConsumer()
+        consumer.max_rate_violations = 2
+        consumer.rate_limiter = mock.Mock(allow=mock.Mock(return_value=False))
+        consumer.close = mock.AsyncMock()
+        return consumer
+
+    async def _refuse(self, consumer, now, times):
+        with mock.patch('time.monotonic', return_value=now):
+            for _ in range(times):
+                await consumer.receive(text_data='{"type": "ping"}')
+
+    async def test_violations_within_a_window_close_the_socket(self, send_error):
+        consumer = self._consumer()
+
+        await self._refuse(consumer, 100.0, 3)
+
+        consumer.close.assert_awaited_once_with(code=4029, reason="Rate limit exceeded")
+
+    async def test_violations_reset_once_the_window_passes(self, send_error):
+        consumer = self._consumer()
+
+        await self._refuse(consumer, 100.0, 2)
+        await self._refuse(consumer, 100.0 + consumer.rate_violation_window, 2)
+
+        consumer.close.assert_not_awaited()
+        self.assertEqual(consumer.rate_violations, 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+@mock.patch('room.services.directory_service.online_counts', return_value={})
+class DirectoryPagingTests(TestCase):
+
+    def setUp(self):
+        suffix = uuid.uuid4().hex[:6]
+        self.owner = CustomUser.objects.create_user(email=f'host-{suffix}@example.com', username=f'host-{suffix}')
+        created = timezone.now()
+        # Three rooms share a creation time so the cursor has to break the tie on room_id
+        rooms = Room.objects.bulk_create([
+            Room(name=f'Room {i}', owner=self.owner, topic='ARRAY', difficulty='EASY', time_limit=10,
+                 capacity=2, participant_count=2 if i % 2 else 1)
+            for i in range(7)
+        ])
+        for i, room in enumerate(rooms):
+            Room.objects.filter(room_id=room.room_id).update(created_at=created - timedelta(minutes=max(i - 2, 0)))
+
+    def _all_pages(self, filters=None):
+        rooms, cursor = [], None
+        while True:
+            page = room_page(filters, cursor=cursor, limit=2, fresh=True)
+            rooms.extend(page['rooms'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return rooms
+
+    def test_pages_cover_every_room_once_newest_first(self, online_counts):
+        rooms = self._all_pages()
+
+        self.assertEqual(len(rooms), 7)
+        self.assertEqual(len({room['room_id'] for room in rooms}), 7)
+        keys = [(room['created_at'], room['room_id']) for room in rooms]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_has_space_filters_on_seats(self, online_counts):
+        rooms = self._all_pages({'has_space': True})
+
+        self.assertEqual(len(rooms), 4)
+        self.assertTrue(all(room['seats_taken'] < room['capacity'] for room in rooms))
+
+    def test_malformed_cursor_is_rejected(self, online_counts):
+        with self.assertRaises(ValueError):
+            room_page(cursor='not-a-cursor')
+
+
+class AdmissionTests(TestCase):
+
+    def setUp(self):
+        suffix = uuid.uuid4().hex[:6]
+        self.owner, self.player = [
+            CustomUser.objects.create_user(email=f'{name}-{suffix}@example.com', username=f'{name}-{suffix}')
+            for name in ('host', 'player')
+        ]
+        self.room = Room.objects.bulk_create([Room(
+            name='Lobby', owner=self.owner, topic='ARRAY', difficulty='EASY', time_limit=10, capacity=5,
+            participant_count=1,
+        )])[0]
+
+    def _participant(self, **fields):
+        # bulk_create skips the room-list broadcast signal
+        return RoomParticipant.objects.bulk_create([RoomParticipant(room=self.room, user=self.player, **fields)])[0]
+
+    def test_player_who_left_takes_a_seat_again(self):
+        self._participant(status='left')
+
+        participant, admitted = admit_participant(self.room.room_id, self.player)
+
+        self.assertTrue(admitted)
+        self.assertEqual(participant.status, 'joined')
+        self.room.refresh_from_db(fields=['participant_count'])
+        self.assertEqual(self.room.participant_count, 2)
+
+    def test_kicked_or_blocked_player_is_not_readmitted(self):
+        for fields in ({'status': 'kicked', 'blocked': True}, {'status': 'left', 'blocked': True}):
+            with self.subTest(**fields):
+                row = self._participant(**fields)
+
+                participant, admitted = admit_participant(self.room.room_id, self.player)
+
+                self.assertIsNone(participant)
+                self.assertFalse(admitted)
+                row.refresh_from_db(fields=['status'])
+                self.assertEqual(row.status, fields['status'])
+                row.delete()
+        self.room.refresh_from_db(fields=['participant_count'])
+        self.assertEqual(self.room.participant_count, 1)
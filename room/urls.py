@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     RoomListAPIView, CreateRoomAPIView, RoomDetailAPIView,
-    JoinRoomAPIView, KickParticipantAPIView, StartRoomAPIView
+    JoinRoomAPIView, KickParticipantAPIView, StartRoomAPIView, ChatHistoryAPIView
 )
 
 urlpatterns = [
@@ -11,4 +11,5 @@ urlpatterns = [
     path('<uuid:room_id>/join/', JoinRoomAPIView.as_view(), name='join_room'),
     path('<uuid:room_id>/kick/', KickParticipantAPIView.as_view(), name='kick_participant'),
     path('<uuid:room_id>/start/', StartRoomAPIView.as_view(), name='start_room'),
+    path('<uuid:room_id>/chat/', ChatHistoryAPIView.as_view(), name='chat_history'),
 ]
\ No newline at end of file
@@ -1,15 +1,67 @@
+import time
+
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
 
+# Reconnect storms (room list, lobby and battle sockets opened back to back)
+# reuse the principal loaded for the same access token for this long.
+WS_AUTH_CACHE_TTL = 60
+
+
+def _generation_key(user_id):
+    return f'ws-auth:gen:{user_id}'
+
+
+def _principal_key(jti):
+    return f'ws-auth:jti:{jti}'
+
+
+def invalidate_ws_auth(user_id):
+    """Forget every cached principal of a user (logout, blacklist, block)."""
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        cache.set(_generation_key(user_id), 1, timeout=None)
+
+
+def load_ws_principal(jwt_auth, validated_token):
+    """
+    Return the user behind a validated token, cached by its JTI.
+
+    Cache entries remember the user's generation counter; bumping it through
+    `invalidate_ws_auth` makes every entry of that user stale at once.
+    """
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    jti = validated_token.get(api_settings.JTI_CLAIM)
+    if user_id is None or jti is None:
+        return jwt_auth.get_user(validated_token)
+
+    cached = cache.get_many([_principal_key(jti), _generation_key(user_id)])
+    generation = cached.get(_generation_key(user_id), 0)
+    entry = cached.get(_principal_key(jti))
+    if entry and entry[0] == generation:
+        return entry[1]
+
+    user = jwt_auth.get_user(validated_token)
+    ttl = min(WS_AUTH_CACHE_TTL, int(validated_token.get('exp', time.time()) - time.time()))
+    if ttl > 0:
+        cache.set(_principal_key(jti), (generation, user), timeout=ttl)
+    return user
+
+
 class WebSocketAuthMixin:
     @database_sync_to_async
     def get_user_from_token(self, token):
         try:
             jwt_auth = JWTAuthentication()
             validated_token = jwt_auth.get_validated_token(token)
-            user = jwt_auth.get_user(validated_token)
+            user = load_ws_principal(jwt_auth, validated_token)
+            if getattr(user, 'is_blocked', False):
+                return None
             return user
         except AuthenticationFailed:
             return None
@@ -32,4 +84,4 @@ class WebSocketAuthMixin:
             await self.close(code=4002, reason="Invalid or expired token")
             return None
 
-        return user
\ No newline at end of file
+        return user
@@ -5,15 +5,20 @@ import random
 
 
 
+def playable_questions():
+    """Questions a battle may use: validated, and accepted if contributed."""
+    return Question.objects.filter(
+        Q(is_contributed=False) | Q(is_contributed=True, contribution_status="Accepted")
+    ).exclude(is_validate=False)
+
+
 def select_random_question(room):
     print("call came for question selection")
     print("topic=",room.topic)
-    question_options = Question.objects.filter(
+    question_options = playable_questions().filter(
         difficulty=room.difficulty,
         tags=room.topic
-    ).filter(
-        Q(is_contributed=False) | Q(is_contributed=True, contribution_status="Accepted")
-    ).exclude(is_validate=False)
+    )
 
     print("Available questions: ", question_options)
 
@@ -0,0 +1,58 @@
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import DEFAULT_CHANNEL_LAYER, get_channel_layer
+from django.conf import settings
+from room.utils.encoding import dumps_json
+
+ROOMS_GROUP = 'rooms'
+
+
+def layer_for_group(group_name):
+    """The high-fanout `rooms` group lives on its own channel layer."""
+    if group_name == ROOMS_GROUP:
+        return get_channel_layer(settings.ROOMS_CHANNEL_LAYER)
+    return get_channel_layer(DEFAULT_CHANNEL_LAYER)
+
+
+def frame_event(data):
+    """
+    Wrap a frame for group_send. Only its JSON encoding crosses the channel
+    layer; consumer processes derive the other encodings from it once each.
+    """
+    return {
+        'type': 'send_frame',
+        'frame_type': data.get('type'),
+        'frame_id': uuid.uuid4().hex,
+        'frame': dumps_json(data),
+    }
+
+
+async def broadcast(group_name, data):
+    """Serialize `data` once and fan it out to every consumer in the group."""
+    await layer_for_group(group_name).group_send(group_name, frame_event(data))
+
+
+def broadcast_sync(group_name, data):
+    """Same as `broadcast`, for views, signals and Celery tasks."""
+    async_to_sync(layer_for_group(group_name).group_send)(group_name, frame_event(data))
+
+
+def user_group_name(user_id):
+    """Per-user group joined by each of the user's battle sockets."""
+    return f'user_{user_id}'
+
+
+def push_to_user(user_id, data):
+    """Send a frame to one player only, on every battle socket they have open."""
+    broadcast_sync(user_group_name(user_id), data)
+
+
+def matchmaking_group_name(user_id):
+    """Per-user group joined by each of the user's matchmaking sockets."""
+    return f'mm_user_{user_id}'
+
+
+def push_to_matchmaking(user_id, data):
+    """Send a frame to one player's matchmaking sockets only."""
+    broadcast_sync(matchmaking_group_name(user_id), data)
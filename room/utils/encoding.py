@@ -0,0 +1,149 @@
+import json
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+try:
+    import msgpack  # installed with channels_redis
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+JSON = 'json'
+COMPACT = 'compact'
+MSGPACK = 'msgpack'
+
+SUBPROTOCOLS = {
+    'bitwar.json': JSON,
+    'bitwar.compact': COMPACT,
+    'bitwar.msgpack': MSGPACK,
+}
+
+# Keys that repeat for every room / participant / chat line. `type` is never
+# shortened so clients can route a frame before expanding it.
+COMPACT_KEYS = {
+    'room_id': 'r',
+    'name': 'n',
+    'owner__username': 'o',
+    'user__username': 'u',
+    'username': 'un',
+    'topic': 'tp',
+    'difficulty': 'd',
+    'time_limit': 'tl',
+    'capacity': 'c',
+    'participant_count': 'pc',
+    'seats_taken': 'st',
+    'participants': 'ps',
+    'visibility': 'v',
+    'status': 's',
+    'is_ranked': 'rk',
+    'join_code': 'jc',
+    'role': 'rl',
+    'ready': 'rd',
+    'rooms': 'rs',
+    'message': 'm',
+    'messages': 'ms',
+    'sender': 'sd',
+    'timestamp': 'ts',
+    'is_system': 'sy',
+    'remaining_seconds': 'rem',
+    'winners': 'w',
+    'position': 'p',
+    'completion_time': 'ct',
+}
+EXPANDED_KEYS = {short: full for full, short in COMPACT_KEYS.items()}
+
+
+def available_encodings():
+    encodings = [JSON, COMPACT]
+    if msgpack is not None:
+        encodings.append(MSGPACK)
+    return encodings
+
+
+def negotiate_encoding(scope):
+    """
+    Pick the frame encoding for a connection.
+
+    A `bitwar.*` subprotocol wins over the `encoding` query parameter. Returns
+    the encoding and the subprotocol to echo back in the handshake (or None).
+    """
+    supported = available_encodings()
+    for subprotocol in scope.get('subprotocols') or []:
+        encoding = SUBPROTOCOLS.get(subprotocol)
+        if encoding in supported:
+            return encoding, subprotocol
+
+    params = parse_qs(scope.get('query_string', b'').decode())
+    encoding = (params.get('encoding') or [JSON])[0]
+    return (encoding if encoding in supported else JSON), None
+
+
+def _rename_keys(data, mapping):
+    if isinstance(data, dict):
+        return {mapping.get(key, key): _rename_keys(value, mapping) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_rename_keys(item, mapping) for item in data]
+    return data
+
+
+def dumps_json(data):
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            pass
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+def encode_frame(data, encoding=JSON):
+    """Encode one outgoing frame. Returns str for text frames, bytes for binary."""
+    if encoding == COMPACT:
+        return dumps_json(_rename_keys(data, COMPACT_KEYS))
+    if encoding == MSGPACK:
+        return msgpack.packb(_rename_keys(data, COMPACT_KEYS), use_bin_type=True, default=str)
+    return dumps_json(data)
+
+
+# Recently encoded group frames, keyed by (frame_id, encoding). Shared by every
+# consumer in the process, so each frame is encoded at most once per encoding
+# that a local socket actually uses.
+_group_frames = OrderedDict()
+GROUP_FRAME_CACHE_SIZE = 256
+
+
+def encode_group_frame(event, encoding):
+    """
+    The `send_frame` event's frame in `encoding`. The event carries it as JSON
+    text, which JSON sockets send as is; other encodings are derived from it on
+    first use.
+    """
+    if encoding == JSON:
+        return event['frame']
+    key = (event['frame_id'], encoding)
+    frame = _group_frames.get(key)
+    if frame is None:
+        frame = encode_frame(json.loads(event['frame']), encoding)
+        _group_frames[key] = frame
+        if len(_group_frames) > GROUP_FRAME_CACHE_SIZE:
+            _group_frames.popitem(last=False)
+    return frame
+
+
+def decode_frame(text_data=None, bytes_data=None, encoding=JSON):
+    """Decode an incoming frame; raises ValueError when it cannot be parsed."""
+    if bytes_data is not None:
+        if encoding != MSGPACK:
+            raise ValueError("Binary frames require the msgpack encoding")
+        try:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        except Exception as e:
+            raise ValueError(str(e))
+    else:
+        data = json.loads(text_data)
+    if encoding in (COMPACT, MSGPACK):
+        data = _rename_keys(data, EXPANDED_KEYS)
+    return data
@@ -12,5 +12,8 @@ ERRORS = {
     'RANKED_NOT_READY': {'message': 'All participants must be ready for ranked mode', 'code': 4011},
     'HOST_ONLY_CLOSE': {'message': 'Only the host can close the room', 'code': 4012},
     'CLOSE_ROOM_FAILED': {'message': 'Failed to close room', 'code': 4013},
+    'ROOM_FULL': {'message': 'Room is full', 'code': 4014},
     'PRIVATE_ROOM_NOT_AUTHORIZED': {'message': 'Not authorized to join private room', 'code': 4005},
+    # 4000 keeps the socket open: a repeated start press is not fatal
+    'COUNTDOWN_IN_PROGRESS': {'message': 'Countdown already in progress', 'code': 4000},
 }
\ No newline at end of file
@@ -0,0 +1,34 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from room.services.presence_service import mark_online, mark_offline
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceMixin:
+    """Keeps a heartbeat-refreshed presence entry alive for the connection."""
+
+    async def start_presence(self, room_id, user):
+        self.presence_room_id = room_id
+        self.presence_user_id = user.user_id
+        await mark_online(room_id, user.user_id, self.channel_name)
+        self.presence_task = asyncio.create_task(self._presence_heartbeat())
+
+    async def _presence_heartbeat(self):
+        interval = settings.PRESENCE_TTL / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await mark_online(self.presence_room_id, self.presence_user_id, self.channel_name)
+            except Exception as e:
+                logger.error(f"[PRESENCE] Heartbeat failed for room {self.presence_room_id}: {str(e)}")
+
+    async def stop_presence(self):
+        task = getattr(self, 'presence_task', None)
+        if task is None:
+            return
+        task.cancel()
+        self.presence_task = None
+        await mark_offline(self.presence_room_id, self.presence_user_id, self.channel_name)
@@ -0,0 +1,37 @@
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, tokens=1):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+class ConnectionRateLimiter:
+    """
+    One bucket per configured message type for a single WebSocket connection.
+    Every other type shares one default bucket, so made-up types are limited
+    together and cannot grow the bucket table.
+    """
+
+    def __init__(self, limits, default):
+        self.buckets = {message_type: TokenBucket(*limit) for message_type, limit in limits.items()}
+        self.default_bucket = TokenBucket(*default)
+
+    def allow(self, message_type):
+        return self.buckets.get(message_type, self.default_bucket).consume()
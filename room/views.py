@@ -1,10 +1,10 @@
 import json
 import logging
 import traceback
+from datetime import timedelta
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db.models import F, Q
+from django.db import transaction
+from django.db.models import Q
 from django.shortcuts import render
 from django.utils import timezone
 from rest_framework import status
@@ -13,9 +13,15 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from authentication.models import CustomUser
+from battle.services.deadline_service import schedule_battle_deadline
 from problems.models import Question, Example
 from .models import Room, RoomParticipant
 from .serializers import RoomCreateSerializer
+from .services.chat_service import CHAT_HISTORY_LIMIT, get_chat_page
+from .services.directory_service import PAGE_SIZE, clean_filters, room_page
+from .services.lobby_state_service import publish_lobby_state
+from .services.participant_service import admit_participant, release_seat
+from .utils.broadcast import broadcast_sync
 from .utils.battle import select_random_question
 
 logger = logging.getLogger(__name__)
@@ -23,11 +29,14 @@ logger = logging.getLogger(__name__)
 class RoomListAPIView(APIView):
     def get(self, request):
         try:
-            rooms = Room.objects.filter(is_active=True).values(
-                'room_id', 'name', 'owner__username', 'topic', 'difficulty',
-                'time_limit', 'capacity', 'participant_count', 'visibility', 'status', 'join_code', 'is_ranked'
+            page = room_page(
+                clean_filters(request.query_params),
+                cursor=request.query_params.get('cursor'),
+                limit=request.query_params.get('limit', PAGE_SIZE),
             )
-            return Response({'rooms': list(rooms)}, status=status.HTTP_200_OK)
+            return Response(page, status=status.HTTP_200_OK)
+        except (ValueError, TypeError):
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Failed to fetch rooms: {str(e)}")
             return Response({'error': f'Failed to fetch rooms: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -75,26 +84,22 @@ class CreateRoomAPIView(APIView):
                 traceback.print_exc()
                 return Response({'error': f'Failed to create participant: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                'rooms',
-                {
-                    'type': 'room_update',
-                    'rooms': [{
-                        'room_id': str(room.room_id),
-                        'name': room.name,
-                        'owner__username': room.owner.username,
-                        'topic': room.topic,
-                        'difficulty': room.difficulty,
-                        'time_limit': room.time_limit,
-                        'capacity': room.capacity,
-                        'participant_count': room.participant_count,
-                        'visibility': room.visibility,
-                        'status': room.status,
-                        'is_ranked': room.is_ranked,
-                    }]
-                }
-            )
+            broadcast_sync('rooms', {
+                'type': 'room_update',
+                'rooms': [{
+                    'room_id': str(room.room_id),
+                    'name': room.name,
+                    'owner__username': room.owner.username,
+                    'topic': room.topic,
+                    'difficulty': room.difficulty,
+                    'time_limit': room.time_limit,
+                    'capacity': room.capacity,
+                    'participant_count': room.participant_count,
+                    'visibility': room.visibility,
+                    'status': room.status,
+                    'is_ranked': room.is_ranked,
+                }]
+            })
 
             return Response({
                 'message': 'Room created successfully',
@@ -161,14 +166,10 @@ class JoinRoomAPIView(APIView):
             if participant:
                 if participant.blocked:
                     return Response({'status': 'blocked', 'message': 'User is blocked from this room'}, status=status.HTTP_403_FORBIDDEN)
-                participant.status = 'joined'
-                participant.left_at = None
-                participant.save()
-                        
-                room.participant_count = RoomParticipant.objects.filter(
-                    room_id=room_id, status='joined'
-                ).count()
-                room.save()
+                participant, _ = admit_participant(room.room_id, request.user)
+                if participant is None:
+                    return Response({'error': 'Room is full'}, status=status.HTTP_400_BAD_REQUEST)
+                room.refresh_from_db(fields=['participant_count'])
 
                 participants = RoomParticipant.objects.filter(room=room).values('user__username', 'role', 'status', 'ready')
                 return Response({
@@ -203,47 +204,31 @@ class JoinRoomAPIView(APIView):
                 if not password or room.password != password:
                     return Response({'error': 'Invalid password'}, status=status.HTTP_403_FORBIDDEN)
 
-            new_participant, created = RoomParticipant.objects.get_or_create(
-                room=room,
-                user=request.user,
-                defaults={'role': 'participant', 'status': 'joined'}
-            )
-
-            if created:
-                room.participant_count = F('participant_count') + 1
-                room.save()
-                room.refresh_from_db()
+            new_participant, _ = admit_participant(room.room_id, request.user)
+            if new_participant is None:
+                return Response({'error': 'Room is full'}, status=status.HTTP_400_BAD_REQUEST)
+            room.refresh_from_db(fields=['participant_count'])
 
-            channel_layer = get_channel_layer()
             participants = RoomParticipant.objects.filter(room=room).values('user__username', 'role', 'status', 'ready')
-            async_to_sync(channel_layer.group_send)(
-                f'room_{room_id}',
-                {
-                    'type': 'participant_update',
-                    'participants': list(participants),
-                }
-            )
-            async_to_sync(channel_layer.group_send)(
-                'rooms',
-                {
-                    'type': 'room_update',
-                    'rooms': [{
-                        'room_id': str(room.room_id),
-                        'name': room.name,
-                        'owner__username': room.owner.username,
-                        'current_user': request.user.username,
-                        'topic': room.topic,
-                        'difficulty': room.difficulty,
-                        'time_limit': room.time_limit,
-                        'capacity': room.capacity,
-                        'participant_count': room.participant_count,
-                        'visibility': room.visibility,
-                        'status': room.status,
-                        'join_code': room.join_code,
-                        'is_ranked': room.is_ranked,
-                    }]
-                }
-            )
+            publish_lobby_state(room_id, {'type': 'participant_joined', 'username': request.user.username})
+            broadcast_sync('rooms', {
+                'type': 'room_update',
+                'rooms': [{
+                    'room_id': str(room.room_id),
+                    'name': room.name,
+                    'owner__username': room.owner.username,
+                    'current_user': request.user.username,
+                    'topic': room.topic,
+                    'difficulty': room.difficulty,
+                    'time_limit': room.time_limit,
+                    'capacity': room.capacity,
+                    'participant_count': room.participant_count,
+                    'visibility': room.visibility,
+                    'status': room.status,
+                    'join_code': room.join_code,
+                    'is_ranked': room.is_ranked,
+                }]
+            })
 
             return Response({
                 'status': 'success',
@@ -287,27 +272,16 @@ class KickParticipantAPIView(APIView):
             if not participant:
                 return Response({'error': 'Participant not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            participant.delete()
-            room.participant_count = F('participant_count') - 1
-            room.save()
-            room.refresh_from_db()
+            with transaction.atomic():
+                deleted, _ = RoomParticipant.objects.filter(pk=participant.pk).delete()
+                if deleted and participant.status == 'joined':
+                    release_seat(room.room_id)
 
-            channel_layer = get_channel_layer()
-            participants = RoomParticipant.objects.filter(room=room).values('user__username', 'role', 'status', 'ready')
-            async_to_sync(channel_layer.group_send)(
-                f'room_{room_id}',
-                {
-                    'type': 'kicked',
-                    'username': username,
-                }
-            )
-            async_to_sync(channel_layer.group_send)(
-                f'room_{room_id}',
-                {
-                    'type': 'participant_update',
-                    'participants': list(participants),
-                }
-            )
+            broadcast_sync(f'room_{room_id}', {
+                'type': 'kicked',
+                'username': username,
+            })
+            publish_lobby_state(room_id, {'type': 'participant_kicked', 'username': username})
 
             return Response({'message': f'Successfully kicked {username}'}, status=status.HTTP_200_OK)
         except Room.DoesNotExist:
@@ -317,6 +291,28 @@ class KickParticipantAPIView(APIView):
             logger.error(f"Error kicking participant: {str(e)}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class ChatHistoryAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, room_id):
+        try:
+            participant = RoomParticipant.objects.filter(room_id=room_id, user=request.user).first()
+            if not participant or participant.blocked:
+                return Response({'error': 'You are not authorised person'}, status=status.HTTP_404_NOT_FOUND)
+
+            try:
+                limit = int(request.query_params.get('limit', CHAT_HISTORY_LIMIT))
+            except ValueError:
+                return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+            page = get_chat_page(str(room_id), before=request.query_params.get('before'), limit=limit)
+            return Response(page, status=status.HTTP_200_OK)
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error fetching chat history for room {room_id}: {str(e)}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class StartRoomAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -354,13 +350,15 @@ class StartRoomAPIView(APIView):
             participant_users = CustomUser.objects.filter(
                 room_participations__room=room
             ).distinct()
-            participant_users.update(total_battles=F('total_battles') + 1)
+            participant_users.record_battle()
 
 
             room.status = 'Playing'
             room.start_time=timezone.now()
             room.active_question = selected_question
-            room.save()
+            room.save(update_fields=['status', 'start_time', 'active_question', 'updated_at'])
+            if room.time_limit > 0:
+                schedule_battle_deadline(room.room_id, room.start_time + timedelta(minutes=room.time_limit))
 
             logger.info(f"Room {room_id} started successfully with question {selected_question.id}")
             return Response({
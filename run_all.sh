@@ -15,3 +15,9 @@ celery -A bitWar_backend worker --loglevel=info &
 # Start Celery beat
 celery -A bitWar_backend beat --loglevel=info &
 
+# Start the battle deadline worker
+python manage.py run_battle_deadlines &
+
+# Start the matchmaking worker
+python manage.py run_matchmaker &
+
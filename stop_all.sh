@@ -9,6 +9,12 @@ pkill -f "celery -A bitWar_backend worker"
 echo "🛑 Stopping Celery beat..."
 pkill -f "celery -A bitWar_backend beat"
 
+echo "🛑 Stopping battle deadline worker..."
+pkill -f "manage.py run_battle_deadlines"
+
+echo "🛑 Stopping matchmaking worker..."
+pkill -f "manage.py run_matchmaker"
+
 echo "🛑 (Optional) Stopping Redis server..."
 pkill redis-server
 